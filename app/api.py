@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
-from fastapi.responses import PlainTextResponse
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlmodel import Session, select, create_engine, Field
 from .models import ProposalSession
 from .utils import chat_agent, structured_agent, ProposalInput as ProposalInputModel, BASE_PROMPT
@@ -7,11 +7,23 @@ from .util import agent as proposal_agent, ProposalInput
 import uuid
 import os
 import asyncio
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 from dotenv import load_dotenv  
 import logging
+from datetime import datetime
 from .models import ChatHistoryTable, ProposalStatus
 from .service import chat_history_to_model_messages, ChatMessage, ChatHistory
+from .search import index_session, index_chat_message, search_documents, DOC_TYPES
+from .export import export_stream, export_watermark, parquet_supported, EXPORT_FORMATS, MEDIA_TYPES
+from .idempotency import run_idempotent, fingerprint_request
+from .deadline import DEADLINE_BUDGETS, Deadline, DeadlineExceeded, deadline_for, deadline_exceeded, chat_hedger
+from .routing import model_router
+from .concurrency import concurrency_limiter
+from .speculative import speculative_generations
+from .rollups import (
+    record_session_started, record_chat_turn, record_question_reached,
+    record_session_completed, record_proposal_generated, dashboard_stats,
+)
 from pydantic import BaseModel
     
 
@@ -25,6 +37,16 @@ def get_session():
     with Session(engine) as session:
         yield session
 
+
+def release_connection(db: Session) -> None:
+    """End the open transaction so its pooled connection isn't held while a model call is awaited.
+
+    The async endpoints use the synchronous pool from the event loop thread. A connection
+    kept across a slow model call lets concurrent requests drain the pool, and the next
+    checkout then blocks the whole loop. Loaded objects reload on their next attribute access.
+    """
+    db.commit()
+
 router = APIRouter()
 
 # Add latest_proposal to ProposalSession if not present
@@ -43,15 +65,78 @@ You are a professional technical writer.\n\nWrite a detailed project proposal us
     base += "\nWrite in a professional tone, using clear section headings and bullet points where appropriate.\nEnsure the proposal flows logically from problem identification to solution implementation."
     return base
 
+def proposal_base_data(session: ProposalSession) -> dict:
+    return {
+        "client_name": session.client_name,
+        "project_title": session.project_title,
+        "problem_statement": session.problem_statement,
+        "proposed_solution": session.proposed_solution,
+        "previous_experience": session.previous_experience,
+        "objectives": session.objectives,
+        "implementation_plan": session.implementation_plan,
+        "benefits": session.benefits,
+        "timeline": session.timeline,
+        "budget": session.budget,
+        "deliverables": session.deliverables,
+        "technologies": session.technologies
+    }
+
+
+async def _generate_proposal_text(prompt: str) -> str:
+    result = await model_router.run("proposal", proposal_agent, prompt)
+    return result.output
+
+
+def _store_speculative_proposal(
+    session_id: str, fingerprint: str, previous_proposal: Optional[str], proposal_text: str
+) -> None:
+    # Runs after the request that started it has finished, so it needs its own DB session
+    with Session(engine) as db:
+        session = db.get(ProposalSession, session_id)
+        if not session or fingerprint_request(proposal_base_data(session)) != fingerprint:
+            logging.info(f"🗑️ Discarding speculative proposal for session {session_id}: fields changed")
+            return
+        # A styled or custom proposal saved since the speculation began (possibly by
+        # another worker) wins over the default-style one
+        if session.latest_proposal != previous_proposal:
+            logging.info(f"🗑️ Discarding speculative proposal for session {session_id}: a newer proposal was saved")
+            return
+        session.latest_proposal = proposal_text
+        session.updated_at = datetime.utcnow()
+        db.add(session)
+        index_session(db, session)
+        db.commit()
+
+
+def start_speculative_generation(session: ProposalSession) -> None:
+    """Begin the default-style generation that /generate will most likely ask for next."""
+    session_id = session.session_id
+    previous_proposal = session.latest_proposal
+    base_data = proposal_base_data(session)
+    prompt = format_full_proposal_prompt(base_data, "")
+    speculative_generations.start(
+        session_id,
+        base_data,
+        lambda: _generate_proposal_text(prompt),
+        lambda fingerprint, text: _store_speculative_proposal(session_id, fingerprint, previous_proposal, text),
+    )
+
+
 class ContinueProposalRequest(BaseModel):
     response: str
 
 # 1. Start proposal session
 @router.post("/start_proposal")
-async def start_proposal(db: Session = Depends(get_session)):
+async def start_proposal(
+    db: Session = Depends(get_session),
+    deadline: Deadline = Depends(deadline_for("start_proposal")),
+):
     session_id = str(uuid.uuid4())
     # Pass BASE_PROMPT as the initial prompt to the agent
-    ai_response = await chat_agent.run(BASE_PROMPT)
+    try:
+        ai_response = await chat_hedger.run(lambda: model_router.run("chat", chat_agent, BASE_PROMPT), deadline)
+    except DeadlineExceeded:
+        raise deadline_exceeded("start_proposal")
     if not ai_response or not getattr(ai_response, "output", None):
         raise HTTPException(status_code=500, detail="Failed to get initial AI response")
     reason = getattr(ai_response.output, "reason", "").strip()
@@ -82,6 +167,8 @@ async def start_proposal(db: Session = Depends(get_session)):
         latest_proposal=None,
     )
     db.add(proposal_session)
+    index_session(db, proposal_session)
+    record_session_started(db)
     db.commit()
     db.refresh(proposal_session)
 
@@ -92,6 +179,11 @@ async def start_proposal(db: Session = Depends(get_session)):
         role="assistant"
     )
     db.add(chat_entry)
+    # Bump updated_at with every chat row so incremental exports pick the message up
+    proposal_session.updated_at = datetime.utcnow()
+    db.add(proposal_session)
+    db.flush()
+    index_chat_message(db, chat_entry, proposal_session)
     db.commit()
 
     return {
@@ -107,7 +199,20 @@ async def continue_proposal(
     session_id: str,
     body: ContinueProposalRequest,
     db: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    deadline: Deadline = Depends(deadline_for("continue_proposal")),
 ):
+    if not idempotency_key:
+        return await _continue_proposal(session_id, body, db, deadline)
+    # A retried key replays the first response instead of storing the message and calling the model again
+    return await run_idempotent(
+        f"continue_proposal:{session_id}:{idempotency_key}",
+        fingerprint_request(session_id, body.response),
+        lambda: _continue_proposal(session_id, body, db, deadline),
+    )
+
+
+async def _continue_proposal(session_id: str, body: ContinueProposalRequest, db: Session, deadline: Deadline):
     try:
         logging.info(f"📨 Incoming /continue_proposal for session_id={session_id} | body={body}")
 
@@ -125,9 +230,9 @@ async def continue_proposal(
             logging.warning("⚠️ Missing 'response' in request body")
             raise HTTPException(status_code=422, detail="Missing 'response' in request body")
 
-        # 3. Save user message to chat history (explicit role)
-        db.add(ChatHistoryTable(message=user_response, session_id=session_id, role="user"))
-        db.commit()
+        # 3. Build the user message (explicit role). It is only saved together with the
+        # reply, so a turn that fails or times out leaves nothing behind for a retry to repeat
+        user_entry = ChatHistoryTable(message=user_response, session_id=session_id, role="user")
 
         # 4. Reconstruct chat history into ChatHistory model
         chat_entries = db.exec(
@@ -138,6 +243,7 @@ async def continue_proposal(
 
         # Use stored roles
         chat_messages = [ChatMessage(role=entry.role, message=entry.message) for entry in chat_entries]
+        chat_messages.append(ChatMessage(role="user", message=user_response))
         chat_history = ChatHistory(history=chat_messages)
         model_messages = chat_history_to_model_messages(chat_history)
 
@@ -145,11 +251,14 @@ async def continue_proposal(
         data = BASE_PROMPT + "\n\n" + "\n".join(
             f"[{msg.role.upper()}] {msg.message}" for msg in chat_messages
         )
+        release_connection(db)
         
 
         # 5. Get AI response based on structured message history
         # Always pass the full message history and an empty string as the first argument
-        ai_response = await chat_agent.run( data , message_history=model_messages)
+        ai_response = await chat_hedger.run(
+            lambda: model_router.run("chat", chat_agent, data, message_history=model_messages), deadline
+        )
         logging.info(f"AI response from chat_agent.run: {ai_response}")
         output = getattr(ai_response, "output", None)
         if not output:
@@ -160,35 +269,58 @@ async def continue_proposal(
         reasoning = getattr(output, "reason", "").strip()
         recommendation = getattr(output, "recommendation", "")
         done = getattr(output, "done", False)
+        intake_done = done or "all done" in next_question.lower() or reasoning.lower() == "all fields have been successfully collected."
         logging.info(f"AI output fields: done={done}, question={next_question}, reason={reasoning}, recommendation={recommendation}")
         logging.info(f"Raw AI output: {output}")
 
-        # 7. Save assistant response (explicit role)
-        db.add(ChatHistoryTable(message=next_question, session_id=session_id, role="assistant"))
+        # 7. If done, extract the structured proposal before anything is saved. It gets its
+        # own budget rather than whatever the chat turn left over, and if it still fails the
+        # whole turn fails (504/500) with nothing stored, so the client can simply retry it.
+        proposal_data = None
+        if intake_done:
+            extraction_deadline = Deadline(min(DEADLINE_BUDGETS["extraction"], deadline.budget))
+            structured_result = await extraction_deadline.run(
+                model_router.run("extraction", structured_agent, message_history=model_messages)
+            )
+            proposal_data = structured_result.output
+
+        # 8. Save user message, assistant response and extracted fields in one transaction
+        assistant_entry = ChatHistoryTable(message=next_question, session_id=session_id, role="assistant")
+        db.add(user_entry)
+        db.add(assistant_entry)
+        session.updated_at = datetime.utcnow()
+        db.add(session)
+        db.flush()
+        index_chat_message(db, user_entry, session)
+        index_chat_message(db, assistant_entry, session)
+        record_chat_turn(db)
+        if not intake_done and session.progress < 100:
+            record_question_reached(db, sum(1 for msg in chat_messages if msg.role == "assistant") + 1)
+        if proposal_data is not None:
+            for field in [
+                "client_name", "project_title", "problem_statement", "proposed_solution",
+                "previous_experience", "objectives", "implementation_plan",
+                "benefits", "timeline", "budget", "deliverables", "technologies"
+            ]:
+                setattr(session, field, getattr(proposal_data, field, None))
+            if session.progress < 100:
+                session.progress = 100
+                session.completed_at = assistant_entry.timestamp
+                record_session_completed(
+                    db,
+                    sum(1 for msg in chat_messages if msg.role == "user"),
+                    session.client_name,
+                    sum(1 for msg in chat_messages if msg.role == "assistant"),
+                )
+            db.add(session)
+            index_session(db, session)
         db.commit()
         logging.info(f"Assistant response added to chat history: {next_question}")
 
-        # 8. If done, extract and update structured proposal
-        if done or "all done" in next_question.lower() or reasoning.lower() == "all fields have been successfully collected.":
-            try:
-                structured_result = await structured_agent.run(message_history=model_messages)
-                proposal_data = structured_result.output
-
-                for field in [
-                    "client_name", "project_title", "problem_statement", "proposed_solution",
-                    "previous_experience", "objectives", "implementation_plan",
-                    "benefits", "timeline", "budget", "deliverables", "technologies"
-                ]:
-                    setattr(session, field, getattr(proposal_data, field, None))
-
-                db.add(session)
-                db.commit()
-                db.refresh(session)
-
-                logging.info(f"✅ Structured proposal saved for session {session_id}")
-
-            except Exception as extract_exc:
-                logging.error(f"❌ Failed to extract structured proposal: {extract_exc}")
+        if proposal_data is not None:
+            db.refresh(session)
+            logging.info(f"✅ Structured proposal saved for session {session_id}")
+            start_speculative_generation(session)
 
         # 9. Construct final response
         response_parts = [f"[REASONING]\n{reasoning}"]
@@ -199,6 +331,8 @@ async def continue_proposal(
 
     except HTTPException:
         raise
+    except DeadlineExceeded:
+        raise deadline_exceeded("continue_proposal")
     except Exception as e:
         logging.error(f"💥 Unexpected error in /continue_proposal: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -226,24 +360,16 @@ def get_proposal(session_id: str, db: Session = Depends(get_session)):
 
 # 4. Regenerate full proposal with optional style/tone
 @router.post("/proposal/{session_id}/generate")
-async def regenerate_proposal(session_id: str, body: dict = Body(default={}), db: Session = Depends(get_session)):
+async def regenerate_proposal(
+    session_id: str,
+    body: dict = Body(default={}),
+    db: Session = Depends(get_session),
+    deadline: Deadline = Depends(deadline_for("generate")),
+):
     session = db.exec(select(ProposalSession).where(ProposalSession.session_id == session_id)).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    base_data = {
-        "client_name": session.client_name,
-        "project_title": session.project_title,
-        "problem_statement": session.problem_statement,
-        "proposed_solution": session.proposed_solution,
-        "previous_experience": session.previous_experience,
-        "objectives": session.objectives,
-        "implementation_plan": session.implementation_plan,
-        "benefits": session.benefits,
-        "timeline": session.timeline,
-        "budget": session.budget,
-        "deliverables": session.deliverables,
-        "technologies": session.technologies
-    }
+    base_data = proposal_base_data(session)
     style = body.get("style")
     tone = body.get("tone")
     extra = ""
@@ -252,11 +378,25 @@ async def regenerate_proposal(session_id: str, body: dict = Body(default={}), db
     if tone:
         extra += f"Tone: {tone}."
     prompt = format_full_proposal_prompt(base_data, extra)
-    result = await proposal_agent.run(prompt)
-    proposal_text = result.output
+    release_connection(db)
+    try:
+        proposal_text = None
+        if not extra:
+            # Default style: reuse the generation started when the intake finished, if the fields still match
+            proposal_text = await speculative_generations.claim(session_id, base_data, deadline)
+        else:
+            # The default-style speculation must not land on top of this proposal
+            speculative_generations.discard(session_id)
+        if proposal_text is None:
+            proposal_text = await deadline.run(_generate_proposal_text(prompt))
+    except DeadlineExceeded:
+        raise deadline_exceeded("generate")
     # Save the regenerated proposal text to the session (as latest_proposal)
     setattr(session, 'latest_proposal', proposal_text)
+    session.updated_at = datetime.utcnow()
     db.add(session)
+    index_session(db, session)
+    record_proposal_generated(db, session.client_name)
     db.commit()
     db.refresh(session)
     return {"proposal": proposal_text}
@@ -274,30 +414,92 @@ def get_latest_proposal(session_id: str, db: Session = Depends(get_session)):
 
 # 5. Regenerate full proposal with a custom freeform prompt
 @router.post("/proposal/{session_id}/custom_prompt")
-async def custom_prompt_proposal(session_id: str, body: dict, db: Session = Depends(get_session)):
+async def custom_prompt_proposal(
+    session_id: str,
+    body: dict,
+    db: Session = Depends(get_session),
+    deadline: Deadline = Depends(deadline_for("custom_prompt")),
+):
     session = db.exec(select(ProposalSession).where(ProposalSession.session_id == session_id)).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     prompt_text = body.get("prompt")
     if not prompt_text:
         raise HTTPException(status_code=422, detail="Missing 'prompt' in request body")
-    base_data = {
-        "client_name": session.client_name,
-        "project_title": session.project_title,
-        "problem_statement": session.problem_statement,
-        "proposed_solution": session.proposed_solution,
-        "previous_experience": session.previous_experience,
-        "objectives": session.objectives,
-        "implementation_plan": session.implementation_plan,
-        "benefits": session.benefits,
-        "timeline": session.timeline,
-        "budget": session.budget,
-        "deliverables": session.deliverables,
-        "technologies": session.technologies
-    }
+    speculative_generations.discard(session_id)
+    base_data = proposal_base_data(session)
     prompt = format_full_proposal_prompt(base_data, prompt_text)
-    result = await proposal_agent.run(prompt)
+    release_connection(db)
+    try:
+        result = await deadline.run(model_router.run("proposal", proposal_agent, prompt))
+    except DeadlineExceeded:
+        raise deadline_exceeded("custom_prompt")
     proposal_text = result.output
     return {"proposal": proposal_text}
 
+# 6. Full-text search across proposals and chat history
+@router.get("/search")
+def search(
+    q: str = Query(..., min_length=1, description="Words or phrase to search for"),
+    type: Optional[str] = Query(None, description="Restrict to 'proposal' or 'chat' documents"),
+    client: Optional[str] = Query(None, description="Only match this client"),
+    technology: Optional[str] = Query(None, description="Only match proposals using these technologies"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_session),
+):
+    if type and type not in DOC_TYPES:
+        raise HTTPException(status_code=422, detail=f"'type' must be one of {', '.join(DOC_TYPES)}")
+    results = search_documents(db, q, doc_type=type, client=client, technology=technology,
+                               limit=limit, offset=offset)
+    return {"query": q, "count": len(results), "results": results}
+
+# 7. Stream all sessions with their chat logs (optionally only those updated since a watermark)
+@router.get("/export")
+def export_sessions(
+    format: str = Query("jsonl", description="jsonl, csv or parquet"),
+    since: Optional[datetime] = Query(None, description="Only export sessions updated after this timestamp"),
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"'format' must be one of {', '.join(EXPORT_FORMATS)}")
+    # Checked up front: once streaming starts the 200 status has already been sent
+    if format == "parquet" and not parquet_supported():
+        raise HTTPException(status_code=501, detail="Parquet export requires the 'pyarrow' package")
+    until = export_watermark()
+
+    # The export outlives the request dependency, so it owns its own DB session
+    def generate():
+        with Session(engine) as db:
+            yield from export_stream(db, format, since=since, until=until)
+
+    return StreamingResponse(
+        generate(),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="sessions.{format}"',
+            "X-Export-Watermark": until.isoformat(),
+        },
+    )
+
+# 8. Model call latency, hedging counters and routing decisions
+@router.get("/metrics/llm")
+def llm_metrics():
+    return {
+        "chat_turn": chat_hedger.stats(),
+        "routing": model_router.stats(),
+        "speculative_generation": speculative_generations.stats(),
+    }
+
+# Current adaptive concurrency limits and shed counts per route class
+@router.get("/metrics/concurrency")
+def concurrency_metrics():
+    return concurrency_limiter.stats()
 
+# 9. Admin dashboard stats (reads only the rollup tables)
+@router.get("/admin/stats")
+def admin_stats(
+    days: int = Query(30, ge=1, le=366),
+    top_clients: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_session),
+):
+    return dashboard_stats(db, days=days, top_clients=top_clients)
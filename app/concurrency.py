@@ -0,0 +1,268 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from sqlalchemy.pool import QueuePool
+
+# ─────────────── Adaptive Concurrency Limits ───────────────
+# Every request is put in a route class and admitted only while its class is under
+# its current limit. Limits adapt from queueing, gradient-style: the median latency of
+# the last few completions is compared with the median over a long window. While the
+# class is using most of its limit, a short-window median above `tolerance` times the
+# long one (or a failed request) shrinks the limit by `backoff`; otherwise it grows by
+# 1/limit (about +1 per full window). Far below the limit latency changes come from
+# upstream, not from our own queueing, so the limit is left alone. Requests over the
+# limit get an immediate 503 with Retry-After instead of holding a DB session while
+# they wait on Gemini.
+#
+# Admitted requests then also need one of the DB pool's connections. The async handlers
+# check connections out of a synchronous pool on the event loop thread, so an exhausted
+# pool would freeze the whole loop. Requests therefore wait on an asyncio semaphore sized
+# to the pool before they reach the app; the wait counts toward their latency, so the
+# adaptive limits see it as queueing.
+
+CHAT = "chat"
+GENERATION = "generation"
+EXPORT = "export"
+READ = "read"
+
+# Streaming exports run for minutes; their durations say nothing about queueing, so the
+# class has a fixed limit and never feeds the limiter latency samples
+UNSAMPLED_CLASSES = (EXPORT,)
+
+
+def classify(method: str, path: str) -> str:
+    if method == "POST" and (path == "/start_proposal" or path.startswith("/continue_proposal/")):
+        return CHAT
+    if method == "GET" and path == "/export":
+        return EXPORT
+    if method == "POST":
+        return GENERATION
+    return READ
+
+
+def pool_capacity(engine) -> Optional[int]:
+    """How many connections the engine's pool hands out at once, or None if it isn't bounded."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+        return None
+    return pool.size() + pool._max_overflow
+
+
+def _median(samples) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2]
+
+
+class AdaptiveLimit:
+    def __init__(self, initial: int, min_limit: int, max_limit: int, tolerance: float = 1.5,
+                 backoff: float = 0.9, utilization: float = 0.8, short_window: int = 20,
+                 long_window: int = 500, min_samples: int = 20):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.utilization = utilization
+        self.min_samples = min_samples
+        self.inflight = 0
+        self.short = deque(maxlen=short_window)
+        self.long = deque(maxlen=long_window)
+        self.last_decrease = 0.0
+        self.admitted = 0
+        self.shed = 0
+
+    def short_latency(self) -> Optional[float]:
+        return _median(self.short)
+
+    def long_latency(self) -> Optional[float]:
+        return _median(self.long)
+
+    def average_latency(self) -> float:
+        return sum(self.short) / len(self.short) if self.short else 1.0
+
+    def has_capacity(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    def near_limit(self) -> bool:
+        return self.inflight >= self.limit * self.utilization
+
+    def queueing(self) -> bool:
+        if len(self.long) < self.min_samples:
+            return False
+        return self.short_latency() > self.long_latency() * self.tolerance
+
+    def on_complete(self, latency: float, ok: bool) -> None:
+        """Adjust the limit for a request that finished; call before `inflight` is decremented."""
+        self.short.append(latency)
+        self.long.append(latency)
+        if not self.near_limit():
+            return
+        if not ok or self.queueing():
+            now = time.monotonic()
+            # Back off at most once per observed latency, so one burst of slow responses
+            # that were all admitted together counts as a single signal
+            if now - self.last_decrease >= latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "short_latency_seconds": round(self.short_latency() or 0.0, 3),
+            "long_latency_seconds": round(self.long_latency() or 0.0, 3),
+            "average_latency_seconds": round(self.average_latency(), 3),
+        }
+
+
+class ConcurrencyLimiter:
+    """Per-class adaptive limits plus a global cap that reserves headroom for cheap reads."""
+
+    def __init__(self, limits: Dict[str, AdaptiveLimit], max_inflight: int,
+                 read_reserve: float = 0.2, enabled: bool = True):
+        self.limits = limits
+        self.max_inflight = max_inflight
+        self.read_reserve = read_reserve
+        self.enabled = enabled
+        self.db_sessions: Optional[int] = None
+        self.db_slots: Optional[asyncio.Semaphore] = None
+        self.waiting_for_db = 0
+
+    def limit_db_sessions(self, capacity: Optional[int], reserve: int = 1) -> None:
+        """Let at most `capacity - reserve` requests into the app at once.
+
+        The reserved connections are for work outside any request, like storing a
+        speculative proposal. `capacity=None` (an unbounded pool) removes the cap.
+        """
+        if capacity is None:
+            self.db_sessions = self.db_slots = None
+            return
+        self.db_sessions = max(1, capacity - reserve)
+        self.db_slots = asyncio.Semaphore(self.db_sessions)
+
+    @asynccontextmanager
+    async def db_session_slot(self):
+        """Wait, without blocking the event loop, until the request can have a DB connection."""
+        if self.db_slots is None:
+            yield
+            return
+        self.waiting_for_db += 1
+        try:
+            await self.db_slots.acquire()
+        finally:
+            self.waiting_for_db -= 1
+        try:
+            yield
+        finally:
+            self.db_slots.release()
+
+    def total_inflight(self) -> int:
+        return sum(limit.inflight for limit in self.limits.values())
+
+    def try_acquire(self, route_class: str) -> bool:
+        limit = self.limits[route_class]
+        if self.enabled:
+            # Chat and generation may only use the global capacity not reserved for reads
+            cap = self.max_inflight if route_class == READ else int(self.max_inflight * (1 - self.read_reserve))
+            if not limit.has_capacity() or self.total_inflight() >= cap:
+                limit.shed += 1
+                return False
+        limit.inflight += 1
+        limit.admitted += 1
+        return True
+
+    def release(self, route_class: str, latency: Optional[float], ok: bool = True) -> None:
+        """Free the slot; `latency=None` frees it without feeding the limit a sample."""
+        limit = self.limits[route_class]
+        if latency is not None:
+            limit.on_complete(latency, ok)
+        limit.inflight -= 1
+
+    def retry_after(self, route_class: str) -> int:
+        return max(1, min(30, math.ceil(self.limits[route_class].average_latency())))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "max_inflight": self.max_inflight,
+            "inflight": self.total_inflight(),
+            "db_sessions": self.db_sessions,
+            "waiting_for_db": self.waiting_for_db,
+            **{route_class: limit.stats() for route_class, limit in self.limits.items()},
+        }
+
+
+EXPORT_LIMIT = int(os.getenv("CONCURRENCY_EXPORT_LIMIT", "2"))
+
+concurrency_limiter = ConcurrencyLimiter(
+    {
+        CHAT: AdaptiveLimit(initial=int(os.getenv("CONCURRENCY_CHAT_INITIAL", "20")), min_limit=2, max_limit=200),
+        GENERATION: AdaptiveLimit(initial=int(os.getenv("CONCURRENCY_GENERATION_INITIAL", "8")), min_limit=1, max_limit=50),
+        EXPORT: AdaptiveLimit(initial=EXPORT_LIMIT, min_limit=EXPORT_LIMIT, max_limit=EXPORT_LIMIT),
+        READ: AdaptiveLimit(initial=int(os.getenv("CONCURRENCY_READ_INITIAL", "100")), min_limit=10, max_limit=1000),
+    },
+    max_inflight=int(os.getenv("CONCURRENCY_MAX_INFLIGHT", "256")),
+    enabled=os.getenv("CONCURRENCY_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes"),
+)
+
+
+class AdaptiveConcurrencyMiddleware:
+    """ASGI middleware that admits or sheds each HTTP request through a ConcurrencyLimiter."""
+
+    def __init__(self, app, limiter: ConcurrencyLimiter = None):
+        self.app = app
+        self.limiter = limiter or concurrency_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["method"], scope["path"])
+        if not self.limiter.try_acquire(route_class):
+            await self._shed(send, route_class)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.monotonic()
+        try:
+            async with self.limiter.db_session_slot():
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            code = status["code"]
+            # 4xx responses (validation errors, 404s) return early and would drag the
+            # latency baseline down, so they don't count as samples
+            sampled = route_class not in UNSAMPLED_CLASSES and not 400 <= code < 500
+            latency = time.monotonic() - started if sampled else None
+            self.limiter.release(route_class, latency, ok=code < 500)
+
+    async def _shed(self, send, route_class: str) -> None:
+        body = json.dumps({"detail": "Server is busy, please retry shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.limiter.retry_after(route_class)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from fastapi import Header, HTTPException
+
+T = TypeVar("T")
+
+# ─────────────── Deadline Budgets ───────────────
+# Each endpoint gets a total time budget when the request arrives. Every agent call
+# made while serving it is bounded by whatever is left, so a stuck Gemini call fails
+# the request with a 504 instead of pinning it forever. Clients can tighten (never
+# extend) the budget with an X-Request-Timeout-Ms header.
+
+DEADLINE_BUDGETS = {
+    "start_proposal": float(os.getenv("DEADLINE_START_PROPOSAL_SECONDS", "30")),
+    "continue_proposal": float(os.getenv("DEADLINE_CONTINUE_PROPOSAL_SECONDS", "45")),
+    # Structured extraction after the final chat turn; on top of continue_proposal's budget
+    "extraction": float(os.getenv("DEADLINE_EXTRACTION_SECONDS", "30")),
+    "generate": float(os.getenv("DEADLINE_GENERATE_SECONDS", "120")),
+    "custom_prompt": float(os.getenv("DEADLINE_CUSTOM_PROMPT_SECONDS", "120")),
+}
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable`, cancelling it if the deadline passes first."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded()
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded()
+
+
+def deadline_for(endpoint: str):
+    """FastAPI dependency that starts the endpoint's deadline when the request arrives."""
+    budget = DEADLINE_BUDGETS[endpoint]
+
+    def dependency(timeout_ms: Optional[int] = Header(None, alias="X-Request-Timeout-Ms")) -> Deadline:
+        if timeout_ms is not None and timeout_ms > 0:
+            return Deadline(min(budget, timeout_ms / 1000))
+        return Deadline(budget)
+
+    return dependency
+
+
+def deadline_exceeded(endpoint: str) -> HTTPException:
+    logging.warning(f"⏱️ Deadline exceeded in /{endpoint}")
+    return HTTPException(status_code=504, detail="The AI model did not respond in time")
+
+
+# ─────────────── Hedged Requests ───────────────
+class HedgedRunner:
+    """Fires a duplicate call when the first hasn't returned by the observed p95 latency.
+
+    Whichever finishes first wins and the other is cancelled. Hedges are paid from a
+    token bucket: every call adds `max_hedge_ratio` tokens, a hedge spends one, and the
+    bucket holds at most `max_hedge_burst`. Hedges stay near `max_hedge_ratio` of recent
+    calls, and a long quiet stretch can't be saved up for a burst of hedges when the
+    model slows down for everyone.
+    """
+
+    def __init__(self, name: str, enabled: bool, max_hedge_ratio: float = 0.1, max_hedge_burst: float = 2.0,
+                 window: int = 200, min_samples: int = 20, default_delay: float = 5.0):
+        self.name = name
+        self.enabled = enabled
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_hedge_burst = max_hedge_burst
+        self.hedge_tokens = max_hedge_burst
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedge_losses = 0
+        self.hedges_skipped = 0
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def _may_hedge(self) -> bool:
+        if self.hedge_tokens < 1:
+            return False
+        self.hedge_tokens -= 1
+        return True
+
+    async def run(self, call: Callable[[], Awaitable[T]], deadline: Deadline) -> T:
+        """Run `call()` within `deadline`, hedging it once if it is slow."""
+        self.calls += 1
+        self.hedge_tokens = min(self.max_hedge_burst, self.hedge_tokens + self.max_hedge_ratio)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(call())
+        tasks = {primary}
+        hedge = None
+        try:
+            if self.enabled:
+                delay = min(self.hedge_delay(), deadline.remaining())
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and deadline.remaining() > 0:
+                    if self._may_hedge():
+                        self.hedges += 1
+                        hedge = asyncio.ensure_future(call())
+                        tasks.add(hedge)
+                    else:
+                        self.hedges_skipped += 1
+
+            while tasks:
+                remaining = deadline.remaining()
+                if remaining <= 0:
+                    raise DeadlineExceeded()
+                done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceeded()
+                winner = done.pop()
+                if winner.exception() is not None and tasks:
+                    # One attempt failed; let the other one finish
+                    continue
+                result = winner.result()
+                if hedge is not None:
+                    if winner is hedge:
+                        self.hedge_wins += 1
+                    else:
+                        self.hedge_losses += 1
+                self.latencies.append(time.monotonic() - started)
+                return result
+            raise DeadlineExceeded()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_losses": self.hedge_losses,
+            "hedges_skipped": self.hedges_skipped,
+            "hedge_tokens": round(self.hedge_tokens, 2),
+            "hedge_delay_seconds": round(self.hedge_delay(), 3),
+        }
+
+
+chat_hedger = HedgedRunner(
+    "chat_turn",
+    enabled=os.getenv("HEDGE_CHAT_TURNS", "false").lower() in ("1", "true", "yes"),
+    max_hedge_ratio=float(os.getenv("HEDGE_MAX_RATIO", "0.1")),
+    max_hedge_burst=float(os.getenv("HEDGE_MAX_BURST", "2")),
+)
@@ -0,0 +1,250 @@
+import csv
+import importlib.util
+import io
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from sqlalchemy import and_, or_, text
+from sqlmodel import Session, select
+
+from .models import ChatHistoryTable, ProposalSession
+
+# ─────────────── Export Layout ───────────────
+# Sessions are paged with a keyset on (updated_at, session_id) and their messages are
+# fetched with one IN (...) query per page, streamed through a server-side cursor.
+# Only one page is ever held in memory, so memory use doesn't grow with table size.
+
+EXPORT_FORMATS = ("jsonl", "csv", "parquet")
+
+MEDIA_TYPES = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+SESSION_COLUMNS = [
+    "session_id", "created_at", "updated_at", "title", "progress", "status",
+    "client_name", "project_title", "problem_statement", "proposed_solution",
+    "previous_experience", "objectives", "implementation_plan", "benefits",
+    "timeline", "budget", "deliverables", "technologies", "latest_proposal",
+]
+
+MESSAGE_COLUMNS = ["message_id", "role", "timestamp", "message"]
+
+# Writers stamp updated_at from the app clock a moment before they commit. A row stamped
+# just before the export's upper bound can commit after the export has paged past it, so
+# the bound (and the watermark handed back) trails the clock by the longest expected
+# write transaction. Rows newer than that are picked up by the next incremental export.
+EXPORT_WATERMARK_LAG_SECONDS = float(os.getenv("EXPORT_WATERMARK_LAG_SECONDS", "60"))
+
+# create_all only adds indexes when it creates a table, so databases that predate the
+# export need these created explicitly. Names match the ones SQLModel generates.
+EXPORT_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_proposalsession_updated_at ON proposalsession (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_chathistorytable_session_id ON chathistorytable (session_id)",
+]
+
+
+def ensure_export_indexes(engine) -> None:
+    """Create the indexes keyset paging and the batched message query rely on."""
+    with engine.begin() as conn:
+        for statement in EXPORT_INDEXES:
+            conn.execute(text(statement))
+
+
+def export_watermark() -> datetime:
+    """Upper bound for an export that no still-uncommitted write can land below."""
+    return datetime.utcnow() - timedelta(seconds=EXPORT_WATERMARK_LAG_SECONDS)
+
+
+def parquet_supported() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    return value
+
+
+def _session_row(session: ProposalSession) -> dict:
+    return {column: _plain(getattr(session, column, None)) for column in SESSION_COLUMNS}
+
+
+def _message_row(entry: ChatHistoryTable) -> dict:
+    return {
+        "message_id": entry.id,
+        "role": entry.role,
+        "timestamp": _plain(entry.timestamp),
+        "message": entry.message,
+    }
+
+
+def iter_session_batches(
+    db: Session,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 200,
+) -> Iterator[List[dict]]:
+    """Yield pages of sessions (as dicts with a `messages` list) updated in (since, until]."""
+    last_key = None
+    while True:
+        query = select(ProposalSession)
+        if since is not None:
+            query = query.where(ProposalSession.updated_at > since)
+        if until is not None:
+            query = query.where(ProposalSession.updated_at <= until)
+        if last_key is not None:
+            last_updated, last_id = last_key
+            query = query.where(or_(
+                ProposalSession.updated_at > last_updated,
+                and_(ProposalSession.updated_at == last_updated, ProposalSession.session_id > last_id),
+            ))
+        query = query.order_by(ProposalSession.updated_at, ProposalSession.session_id).limit(batch_size)
+        sessions = db.exec(query).all()
+        if not sessions:
+            return
+
+        batch = {session.session_id: {**_session_row(session), "messages": []} for session in sessions}
+        messages = db.exec(
+            select(ChatHistoryTable)
+            .where(ChatHistoryTable.session_id.in_(list(batch)))
+            .order_by(ChatHistoryTable.session_id, ChatHistoryTable.id)
+            .execution_options(stream_results=True, yield_per=1000)
+        )
+        for entry in messages:
+            batch[entry.session_id]["messages"].append(_message_row(entry))
+
+        last_key = (sessions[-1].updated_at, sessions[-1].session_id)
+        # Drop ORM identities so the session doesn't accumulate every exported row
+        db.expunge_all()
+        yield list(batch.values())
+
+
+def _flat_rows(batch: List[dict]) -> Iterator[dict]:
+    """One row per chat message, with the session columns repeated (sessions without messages get one row)."""
+    for session in batch:
+        base = {column: session[column] for column in SESSION_COLUMNS}
+        if not session["messages"]:
+            yield {**base, **{column: None for column in MESSAGE_COLUMNS}}
+        for message in session["messages"]:
+            yield {**base, **message}
+
+
+def stream_jsonl(batches: Iterator[List[dict]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(session, ensure_ascii=False) + "\n" for session in batch).encode()
+
+
+def stream_csv(batches: Iterator[List[dict]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=SESSION_COLUMNS + MESSAGE_COLUMNS)
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(_flat_rows(batch))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every Parquet row group."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_parquet(batches: Iterator[List[dict]]) -> Iterator[bytes]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package") from exc
+
+    schema = pa.schema(
+        [(column, pa.int64() if column == "progress" else pa.string()) for column in SESSION_COLUMNS]
+        + [("message_id", pa.int64()), ("role", pa.string()), ("timestamp", pa.string()), ("message", pa.string())]
+    )
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        rows = list(_flat_rows(batch))
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_stream(
+    db: Session,
+    fmt: str = "jsonl",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 200,
+) -> Iterator[bytes]:
+    """Encode every session updated in (since, until] with its chat log as a byte stream."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    batches = iter_session_batches(db, since=since, until=until, batch_size=batch_size)
+    if fmt == "csv":
+        return stream_csv(batches)
+    if fmt == "parquet":
+        return stream_parquet(batches)
+    return stream_jsonl(batches)
+
+
+# ─────────────── CLI ───────────────
+def main():
+    import argparse
+    import sys
+    from dotenv import load_dotenv
+    from sqlmodel import create_engine
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Export proposal sessions and chat logs")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="Only export sessions updated after this ISO timestamp")
+    parser.add_argument("--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", ""))
+    until = export_watermark()
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        with Session(engine) as db:
+            for chunk in export_stream(db, args.format, since=args.since, until=until, batch_size=args.batch_size):
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    # Pass this back as --since for the next incremental export
+    print(f"watermark={until.isoformat()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+# ─────────────── Simulated-User Harness ───────────────
+# Replays scripted personas through the real /start_proposal -> /continue_proposal flow
+# and reports how many turns, tokens and seconds each intake takes to reach done.
+#
+#   python -m app.harness                                   # deterministic local model
+#   python -m app.harness --model gemini --max-turns 30     # live model, real token counts
+#
+# Persona file: one JSON object per line with a "name" and "answers". "answers" is
+# either a list (replied in order) or an object keyed by field name, answered when the
+# question mentions that field (e.g. "client_name" or "client name").
+
+DEFAULT_PERSONAS = Path(__file__).with_name("harness_personas.jsonl")
+FALLBACK_ANSWER = "I'm not sure yet, please suggest something sensible."
+
+
+def load_personas(path: Path) -> List[dict]:
+    with open(path) as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def answer_for(persona: dict, question: str, turn: int) -> str:
+    answers = persona["answers"]
+    if isinstance(answers, list):
+        return answers[turn] if turn < len(answers) else FALLBACK_ANSWER
+    lowered = question.lower()
+    for field, answer in answers.items():
+        if field.lower() in lowered or field.replace("_", " ").lower() in lowered:
+            return answer
+    return FALLBACK_ANSWER
+
+
+def _is_done(text: str, progress: int) -> bool:
+    # Same signals continue_proposal uses, plus the progress it sets on completion
+    return progress >= 100 or "all done" in text.lower()
+
+
+async def run_persona(client, persona: dict, max_turns: int) -> dict:
+    from sqlmodel import Session
+
+    from .api import engine
+    from .models import ProposalSession
+    from .routing import new_usage, usage_tracker
+
+    usage = new_usage()
+    token = usage_tracker.set(usage)
+    started = time.monotonic()
+    turns = 0
+    done = False
+    error = None
+    try:
+        response = await client.post("/start_proposal")
+        response.raise_for_status()
+        session_id = response.json()["session_id"]
+        question = response.json()["question"]
+        while turns < max_turns:
+            reply = answer_for(persona, question, turns)
+            response = await client.post(f"/continue_proposal/{session_id}", json={"response": reply})
+            response.raise_for_status()
+            turns += 1
+            question = response.text
+            with Session(engine) as db:
+                progress = db.get(ProposalSession, session_id).progress
+            if _is_done(question, progress):
+                done = True
+                break
+    except Exception as exc:
+        error = str(exc)
+    finally:
+        usage_tracker.reset(token)
+
+    return {
+        "persona": persona["name"],
+        "done": done,
+        "turns": turns,
+        "model_requests": usage["requests"],
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "wall_seconds": round(time.monotonic() - started, 3),
+        "error": error,
+    }
+
+
+def _summary(rows: List[dict]) -> None:
+    print(f"\n{'persona':<24}{'done':>6}{'turns':>7}{'prompt tok':>12}{'compl tok':>11}{'wall s':>9}")
+    for row in rows:
+        print(f"{row['persona']:<24}{str(row['done']):>6}{row['turns']:>7}{row['prompt_tokens']:>12}"
+              f"{row['completion_tokens']:>11}{row['wall_seconds']:>9.2f}" + (f"  ⚠️ {row['error']}" if row["error"] else ""))
+    completed = [row for row in rows if row["done"]]
+    print(f"\nCompleted {len(completed)}/{len(rows)} sessions")
+    if completed:
+        for key in ("turns", "prompt_tokens", "completion_tokens", "wall_seconds"):
+            values = [row[key] for row in completed]
+            print(f"  {key:<18} mean={statistics.mean(values):10.1f}  median={statistics.median(values):10.1f}  max={max(values):10.1f}")
+
+
+async def run(personas_path: Path, model: str, max_turns: int, min_questions: int,
+              fields_per_question: int, output: str, database_url: str = "") -> List[dict]:
+    # Never inherit DATABASE_URL from the shell: the harness writes sessions and rollups
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{tempfile.mkdtemp()}/harness.db"
+    if model == "local":
+        os.environ.setdefault("GEMINI_API_KEY", "stand-in")  # Never used, the stand-in answers
+    import httpx
+    from contextlib import nullcontext
+
+    from .api import engine
+    from .concurrency import concurrency_limiter
+    from .main import app, on_startup
+    from .speculative import speculative_generations
+    from .standin import intake_model, override_agents
+
+    engine.echo = False
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    concurrency_limiter.enabled = False
+    speculative_generations.enabled = False  # Only the intake is measured
+    on_startup()
+
+    personas = load_personas(personas_path)
+    overrides = override_agents(intake_model(min_questions, fields_per_question)) if model == "local" else nullcontext()
+    rows = []
+    with overrides:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://harness", timeout=300) as client:
+            for persona in personas:
+                rows.append(await run_persona(client, persona, max_turns))
+
+    _summary(rows)
+    if output:
+        with open(output, "w") as handle:
+            handle.writelines(json.dumps(row) + "\n" for row in rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure turns and tokens to intake completion")
+    parser.add_argument("--personas", type=Path, default=DEFAULT_PERSONAS)
+    parser.add_argument("--model", choices=("local", "gemini"), default="local",
+                        help="local: deterministic stand-in; gemini: the configured live models")
+    parser.add_argument("--max-turns", type=int, default=40)
+    parser.add_argument("--min-questions", type=int, default=12, help="Local model: questions before done")
+    parser.add_argument("--fields-per-question", type=int, default=1, help="Local model: fields asked per turn")
+    parser.add_argument("--output", default="", help="Write per-session results as JSONL")
+    parser.add_argument("--database-url", default="",
+                        help="Database to write sessions to (default: a fresh temporary SQLite file)")
+    args = parser.parse_args()
+    asyncio.run(run(args.personas, args.model, args.max_turns, args.min_questions,
+                    args.fields_per_question, args.output, args.database_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+# ─────────────── Idempotency Keys ───────────────
+# A key moves through two states: "pending" while the first request is running and
+# "done" once its response is stored. Retries with a done key get the stored response,
+# retries with a pending key wait for it. Failed requests release the key so the
+# client can retry for real.
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "120"))
+PENDING_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_TTL_SECONDS", "300"))
+
+CLAIMED = "claimed"
+PENDING = "pending"
+DONE = "done"
+
+
+class InMemoryIdempotencyStore:
+    """Single-process stand-in for Redis, used when REDIS_URL is not set.
+
+    Expired records are swept at most once per `sweep_interval` on claim, so keys that
+    are never retried don't keep their response bodies in memory.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0, clock=time.monotonic):
+        self._records: Dict[str, Tuple[float, dict]] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._sweep_interval = sweep_interval
+        self._clock = clock
+        self._next_sweep = clock() + sweep_interval
+
+    def _drop(self, key: str) -> None:
+        self._records.pop(key, None)
+        event = self._events.pop(key, None)
+        if event:
+            event.set()
+
+    def _sweep(self) -> None:
+        now = self._clock()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self._sweep_interval
+        for key, (expires_at, _) in list(self._records.items()):
+            if expires_at < now:
+                self._drop(key)
+
+    def _get(self, key: str) -> Optional[dict]:
+        item = self._records.get(key)
+        if item is None:
+            return None
+        expires_at, record = item
+        if expires_at < self._clock():
+            self._drop(key)
+            return None
+        return record
+
+    async def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[dict]]:
+        self._sweep()
+        record = self._get(key)
+        if record is None:
+            self._records[key] = (self._clock() + PENDING_TTL_SECONDS, {"state": PENDING, "fingerprint": fingerprint})
+            self._events[key] = asyncio.Event()
+            return CLAIMED, None
+        return record["state"], record
+
+    async def complete(self, key: str, record: dict) -> None:
+        self._records[key] = (self._clock() + IDEMPOTENCY_TTL_SECONDS, record)
+        event = self._events.pop(key, None)
+        if event:
+            event.set()
+
+    async def release(self, key: str) -> None:
+        self._drop(key)
+
+    async def wait(self, key: str, timeout: float) -> Optional[dict]:
+        event = self._events.get(key)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._get(key)
+
+
+class RedisIdempotencyStore:
+    """Shares keys across workers. Pending keys expire on their own if a worker dies."""
+
+    def __init__(self, url: str, prefix: str = "idempotency:"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+
+    async def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[dict]]:
+        pending = json.dumps({"state": PENDING, "fingerprint": fingerprint})
+        if await self._redis.set(self._prefix + key, pending, nx=True, ex=PENDING_TTL_SECONDS):
+            return CLAIMED, None
+        raw = await self._redis.get(self._prefix + key)
+        if raw is None:
+            # Expired between SET and GET; try once more
+            return await self.claim(key, fingerprint)
+        record = json.loads(raw)
+        return record["state"], record
+
+    async def complete(self, key: str, record: dict) -> None:
+        await self._redis.set(self._prefix + key, json.dumps(record), ex=IDEMPOTENCY_TTL_SECONDS)
+
+    async def release(self, key: str) -> None:
+        await self._redis.delete(self._prefix + key)
+
+    async def wait(self, key: str, timeout: float) -> Optional[dict]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            raw = await self._redis.get(self._prefix + key)
+            if raw is None:
+                return None
+            record = json.loads(raw)
+            if record["state"] == DONE:
+                return record
+            await asyncio.sleep(0.1)
+        return None
+
+
+def _make_store():
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        return RedisIdempotencyStore(redis_url)
+    return InMemoryIdempotencyStore()
+
+
+idempotency_store = _make_store()
+
+
+def fingerprint_request(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(record: dict) -> Response:
+    return Response(
+        content=record["body"],
+        status_code=record["status_code"],
+        media_type=record["media_type"],
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def run_idempotent(
+    key: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Response]],
+    store=None,
+) -> Response:
+    """Run `handler` once per key; replay its stored response for any retry with the same key."""
+    store = store or idempotency_store
+    state, record = await store.claim(key, fingerprint)
+
+    if state != CLAIMED:
+        if record.get("fingerprint") != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if state == PENDING:
+            logging.info(f"⏳ Waiting for in-flight request with idempotency key {key}")
+            record = await store.wait(key, IDEMPOTENCY_WAIT_SECONDS)
+            if record is None or record["state"] != DONE:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        logging.info(f"🔁 Replaying stored response for idempotency key {key}")
+        return _replay(record)
+
+    try:
+        response = await handler()
+    except BaseException:
+        await store.release(key)
+        raise
+    await store.complete(key, {
+        "state": DONE,
+        "fingerprint": fingerprint,
+        "status_code": response.status_code,
+        "media_type": response.media_type,
+        "body": response.body.decode(),
+    })
+    return response
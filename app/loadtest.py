@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict
+
+# ─────────────── Load Test ───────────────
+# Drives a burst of mixed traffic (chat turns, generations, reads) at the app in-process,
+# with every agent pointed at a slow local stand-in model, once with the adaptive
+# concurrency limiter off and once with it on.
+#
+#   python -m app.loadtest --requests 600 --latency 1.0 --capacity 20
+
+
+def _configure_env(database_url: str) -> None:
+    # Never inherit DATABASE_URL from the shell: the load test writes thousands of rows
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+    os.environ.setdefault("GEMINI_API_KEY", "stand-in")  # Never used, the stand-in answers
+    os.environ.setdefault("DEADLINE_CONTINUE_PROPOSAL_SECONDS", "60")
+    os.environ.setdefault("DEADLINE_GENERATE_SECONDS", "60")
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, int(len(ordered) * fraction) - 1)]
+
+
+async def _burst(client, session_ids, total: int, mix) -> dict:
+    results = defaultdict(list)  # route class -> [(status, latency)]
+
+    async def one(kind: str):
+        session_id = random.choice(session_ids)
+        started = time.monotonic()
+        if kind == "chat":
+            response = await client.post(f"/continue_proposal/{session_id}", json={"response": "We need a portal."})
+        elif kind == "generation":
+            response = await client.post(f"/proposal/{session_id}/generate", json={})
+        else:
+            response = await client.get(f"/proposal/{session_id}")
+        results[kind].append((response.status_code, time.monotonic() - started))
+
+    kinds = random.choices(list(mix), weights=list(mix.values()), k=total)
+    await asyncio.gather(*(one(kind) for kind in kinds))
+    return results
+
+
+def _report(title: str, results: dict, elapsed: float) -> None:
+    print(f"\n{title} ({elapsed:.1f}s)")
+    print(f"{'class':<12}{'sent':>6}{'ok':>6}{'503':>6}{'other':>7}{'p50 ok':>10}{'p99 ok':>10}{'p50 503':>10}")
+    for kind, samples in sorted(results.items()):
+        ok = [latency for status, latency in samples if status == 200]
+        shed = [latency for status, latency in samples if status == 503]
+        other = len(samples) - len(ok) - len(shed)
+        p50 = f"{statistics.median(ok):.2f}s" if ok else "-"
+        p99 = f"{_percentile(ok, 0.99):.2f}s" if ok else "-"
+        shed_p50 = f"{statistics.median(shed) * 1000:.0f}ms" if shed else "-"
+        print(f"{kind:<12}{len(samples):>6}{len(ok):>6}{len(shed):>6}{other:>7}{p50:>10}{p99:>10}{shed_p50:>10}")
+
+
+async def run(requests: int, latency: float, capacity: int, sessions: int, database_url: str = "") -> Dict[bool, dict]:
+    _configure_env(database_url)
+    import httpx
+
+    from .api import engine
+    from .concurrency import concurrency_limiter
+    from .main import app, on_startup
+    from .standin import override_agents, slow_model
+
+    engine.echo = False
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    on_startup()
+
+    transport = httpx.ASGITransport(app=app)
+    mix = {"chat": 5, "generation": 2, "read": 3}
+    with override_agents(slow_model(latency, capacity)):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=300) as client:
+            concurrency_limiter.enabled = False
+            session_ids = []
+            for _ in range(sessions):
+                response = await client.post("/start_proposal")
+                session_ids.append(response.json()["session_id"])
+
+            bursts = {}
+            for enabled in (False, True):
+                concurrency_limiter.enabled = enabled
+                started = time.monotonic()
+                bursts[enabled] = await _burst(client, session_ids, requests, mix)
+                _report(f"Limiter {'on' if enabled else 'off'}", bursts[enabled], time.monotonic() - started)
+
+    print("\nFinal limits:", concurrency_limiter.stats())
+    return bursts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Burst load test against a slow stand-in model")
+    parser.add_argument("--requests", type=int, default=600, help="Requests per burst")
+    parser.add_argument("--latency", type=float, default=1.0, help="Stand-in model latency in seconds")
+    parser.add_argument("--capacity", type=int, default=20, help="Concurrent calls the stand-in model serves")
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions to seed before the bursts")
+    parser.add_argument("--database-url", default="",
+                        help="Database to write to (default: a fresh temporary SQLite file)")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.latency, args.capacity, args.sessions, args.database_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api import router , engine
+from .search import ensure_search_index, backfill_if_empty
+from .concurrency import AdaptiveConcurrencyMiddleware, concurrency_limiter, pool_capacity
+from .export import ensure_export_indexes
+from .rollups import ensure_rollup_columns
 from sqlmodel import SQLModel, create_engine
 import os
 
@@ -8,6 +12,11 @@ import os
 
 app = FastAPI()
 
+# Shed excess load before it takes a DB session (added first so CORS still wraps the 503s)
+app.add_middleware(AdaptiveConcurrencyMiddleware)
+# Never let more requests in than the DB pool has connections for
+concurrency_limiter.limit_db_sessions(pool_capacity(engine))
+
 # CORS middleware (allow all for dev)
 app.add_middleware(
     CORSMiddleware,
@@ -24,3 +33,7 @@ app.include_router(router)
 @app.on_event("startup")
 def on_startup():
     SQLModel.metadata.create_all(engine)
+    ensure_rollup_columns(engine)
+    ensure_export_indexes(engine)
+    ensure_search_index(engine)
+    backfill_if_empty(engine)
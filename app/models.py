@@ -1,6 +1,6 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from pydantic import BaseModel, Field as PydanticField, validator
 
@@ -14,7 +14,7 @@ class ProposalStatus(str, Enum):
 class ProposalSession(SQLModel, table=True):
     session_id: str = Field(primary_key=True, description="Unique identifier for the session")
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow, description="Creation timestamp")
-    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow, description="Last update timestamp")
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow, index=True, description="Last update timestamp")
     title: str = Field(max_length=255, default="", description="Title of the proposal session")
     progress: int = Field(default=0, ge=0, le=100, description="Progress percentage")
     client_name: str = Field(max_length=255, default="", description="Name of the client")
@@ -31,6 +31,7 @@ class ProposalSession(SQLModel, table=True):
     technologies: str = Field(max_length=512, default="", description="Technologies involved")
     status: ProposalStatus = Field(default=ProposalStatus.ACTIVE, description="Status of the proposal")
     latest_proposal: Optional[str] = Field(default=None, nullable=True, description="Latest proposal details")
+    completed_at: Optional[datetime] = Field(default=None, description="When the intake finished (timestamp of the done reply)")
     sections: List["ProposalSection"] = Relationship(back_populates="session")
     chat_history: List["ChatHistoryTable"] = Relationship(back_populates="session")
 
@@ -55,8 +56,32 @@ class ChatHistoryTable(SQLModel, table=True):
     message: str = Field(description="Content of the message")
     role: str = Field(default="user", max_length=32, description="Role of the sender (user, assistant, system)")
     timestamp: datetime = Field(default_factory=datetime.utcnow, description="Timestamp of the message")
-    session_id: str = Field(foreign_key="proposalsession.session_id", description="Associated session identifier")
+    session_id: str = Field(foreign_key="proposalsession.session_id", index=True, description="Associated session identifier")
     session: ProposalSession = Relationship(back_populates="chat_history")
 
     def __repr__(self):
-        return f"<ChatHistoryTable(id={self.id}, role={self.role}, timestamp={self.timestamp})>"
\ No newline at end of file
+        return f"<ChatHistoryTable(id={self.id}, role={self.role}, timestamp={self.timestamp})>"
+
+# ─────────────── Analytics Rollups ───────────────
+# Maintained incrementally by app.rollups as sessions progress, so the admin
+# dashboard never has to aggregate ProposalSession or ChatHistoryTable.
+
+class DailySessionStats(SQLModel, table=True):
+    day: date = Field(primary_key=True, description="UTC day the events happened on")
+    sessions_started: int = Field(default=0, description="Sessions created")
+    sessions_completed: int = Field(default=0, description="Sessions whose intake finished")
+    turns_to_completion: int = Field(default=0, description="Sum of user turns over completed sessions")
+    chat_turns: int = Field(default=0, description="User answers received")
+    proposals_generated: int = Field(default=0, description="Full proposals generated")
+
+
+class QuestionReachStats(SQLModel, table=True):
+    question_number: int = Field(primary_key=True, description="1-based index of the assistant question")
+    sessions_reached: int = Field(default=0, description="Sessions that were asked this question")
+    sessions_completed_after: int = Field(default=0, description="Sessions whose intake finished after this question")
+
+
+class ClientStats(SQLModel, table=True):
+    client_name: str = Field(primary_key=True, max_length=255, description="Client name as extracted from intake")
+    sessions_completed: int = Field(default=0, description="Completed intakes for this client")
+    proposals_generated: int = Field(default=0, index=True, description="Full proposals generated for this client")
@@ -0,0 +1,236 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, case, inspect, or_, text, func
+from sqlmodel import Session, select
+
+from .models import (
+    ChatHistoryTable, ClientStats, DailySessionStats, ProposalSession, QuestionReachStats,
+)
+
+# ─────────────── Incremental Updates ───────────────
+# Each event adds to its rollup rows with a single INSERT ... ON CONFLICT increment,
+# which both SQLite and Postgres run atomically. Callers commit with their own write.
+
+DAILY_COLUMNS = ("sessions_started", "sessions_completed", "turns_to_completion", "chat_turns", "proposals_generated")
+CLIENT_COLUMNS = ("sessions_completed", "proposals_generated")
+QUESTION_COLUMNS = ("sessions_reached", "sessions_completed_after")
+
+# create_all never alters existing tables, so columns added after a database was
+# created are added at startup. Run `python -m app.rollups` once afterwards to backfill.
+ROLLUP_COLUMNS = {
+    ("proposalsession", "completed_at"): "TIMESTAMP",
+    ("questionreachstats", "sessions_completed_after"): "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def ensure_rollup_columns(engine) -> None:
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for (table, column), ddl in ROLLUP_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _increment(db: Session, table: str, key_column: str, key, counts: dict) -> None:
+    columns = ", ".join(counts)
+    values = ", ".join(f":{column}" for column in counts)
+    updates = ", ".join(f"{column} = {table}.{column} + excluded.{column}" for column in counts)
+    db.execute(
+        text(f"INSERT INTO {table} ({key_column}, {columns}) VALUES (:key, {values}) "
+             f"ON CONFLICT ({key_column}) DO UPDATE SET {updates}"),
+        {"key": key, **counts},
+    )
+
+
+def _add_daily(db: Session, day: Optional[date] = None, **counts) -> None:
+    full = {column: counts.get(column, 0) for column in DAILY_COLUMNS}
+    _increment(db, DailySessionStats.__tablename__, "day", day or datetime.utcnow().date(), full)
+
+
+def _add_client(db: Session, client_name: Optional[str], **counts) -> None:
+    if not client_name:
+        return
+    full = {column: counts.get(column, 0) for column in CLIENT_COLUMNS}
+    _increment(db, ClientStats.__tablename__, "client_name", client_name.strip()[:255], full)
+
+
+def _add_question(db: Session, question_number: int, **counts) -> None:
+    full = {column: counts.get(column, 0) for column in QUESTION_COLUMNS}
+    _increment(db, QuestionReachStats.__tablename__, "question_number", question_number, full)
+
+
+def record_session_started(db: Session) -> None:
+    _add_daily(db, sessions_started=1)
+    record_question_reached(db, 1)
+
+
+def record_chat_turn(db: Session) -> None:
+    _add_daily(db, chat_turns=1)
+
+
+def record_question_reached(db: Session, question_number: int) -> None:
+    """Count the session's `question_number`-th assistant question (never the done reply)."""
+    _add_question(db, question_number, sessions_reached=1)
+
+
+def record_session_completed(db: Session, turns: int, client_name: Optional[str], last_question: int) -> None:
+    """`last_question` is how many questions were asked before the done reply."""
+    _add_daily(db, sessions_completed=1, turns_to_completion=turns)
+    _add_client(db, client_name, sessions_completed=1)
+    if last_question:
+        _add_question(db, last_question, sessions_completed_after=1)
+
+
+def record_proposal_generated(db: Session, client_name: Optional[str]) -> None:
+    _add_daily(db, proposals_generated=1)
+    _add_client(db, client_name, proposals_generated=1)
+
+
+# ─────────────── Compaction ───────────────
+def rebuild_rollups(db: Session) -> None:
+    """Recompute every rollup from the raw tables.
+
+    Used to backfill existing data or repair drift. Proposal generation is not logged
+    per event, so `proposals_generated` is rebuilt as one per session with a
+    `latest_proposal`, counted on the day the session completed.
+    """
+    for model in (DailySessionStats, QuestionReachStats, ClientStats):
+        db.execute(text(f"DELETE FROM {model.__tablename__}"))
+
+    started = db.exec(
+        select(func.date(ProposalSession.created_at), func.count()).group_by(func.date(ProposalSession.created_at))
+    ).all()
+    for day, count in started:
+        _add_daily(db, _as_date(day), sessions_started=count)
+
+    turns = db.exec(
+        select(func.date(ChatHistoryTable.timestamp), func.count())
+        .where(ChatHistoryTable.role == "user")
+        .group_by(func.date(ChatHistoryTable.timestamp))
+    ).all()
+    for day, count in turns:
+        _add_daily(db, _as_date(day), chat_turns=count)
+
+    # Same rules as the live path: every assistant message before the done reply is a
+    # question, and only answers given before it count as turns to completion. Completions
+    # are dated by `completed_at`, which later writes to the session don't move.
+    before_completion = or_(
+        ProposalSession.completed_at.is_(None), ChatHistoryTable.timestamp < ProposalSession.completed_at
+    )
+    sessions = db.exec(
+        select(
+            ProposalSession.progress, ProposalSession.completed_at, ProposalSession.updated_at,
+            ProposalSession.client_name, ProposalSession.latest_proposal,
+            func.count(case((and_(ChatHistoryTable.role == "assistant", before_completion), 1))),
+            func.count(case((and_(ChatHistoryTable.role == "user", before_completion), 1))),
+            func.max(case((ChatHistoryTable.role == "assistant", ChatHistoryTable.timestamp))),
+        )
+        .outerjoin(ChatHistoryTable, ChatHistoryTable.session_id == ProposalSession.session_id)
+        .group_by(ProposalSession.session_id)
+    )
+    asked_counts = Counter()
+    completed_after = Counter()
+    for progress, completed_at, updated_at, client_name, latest_proposal, asked, session_turns, last_reply in sessions:
+        if progress < 100:
+            asked_counts[asked] += 1
+            continue
+        if completed_at is None:
+            # Completed before completed_at was recorded: the done reply is the last
+            # assistant message, and the best date left is when it was sent
+            asked -= 1
+            completed_at = _as_datetime(last_reply) or updated_at or datetime.utcnow()
+        asked_counts[asked] += 1
+        if asked:
+            completed_after[asked] += 1
+        day = completed_at.date()
+        _add_daily(db, day, sessions_completed=1, turns_to_completion=session_turns)
+        _add_client(db, client_name, sessions_completed=1)
+        if latest_proposal:
+            _add_daily(db, day, proposals_generated=1)
+            _add_client(db, client_name, proposals_generated=1)
+
+    for question_number in range(1, max(asked_counts, default=0) + 1):
+        reached = sum(count for asked, count in asked_counts.items() if asked >= question_number)
+        _add_question(db, question_number, sessions_reached=reached,
+                      sessions_completed_after=completed_after[question_number])
+    db.commit()
+
+
+def _as_date(value) -> date:
+    # func.date() comes back as a string on SQLite and a date on Postgres
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    # Aggregates over timestamps come back as strings on SQLite
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+# ─────────────── Dashboard Reads ───────────────
+def dashboard_stats(db: Session, days: int = 30, top_clients: int = 10) -> dict:
+    """Read the admin dashboard from the rollup tables only; cost is bounded by `days` and `top_clients`."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily = db.exec(
+        select(DailySessionStats).where(DailySessionStats.day >= since).order_by(DailySessionStats.day)
+    ).all()
+    completed = sum(row.sessions_completed for row in daily)
+    turns = sum(row.turns_to_completion for row in daily)
+
+    reached = db.exec(select(QuestionReachStats).order_by(QuestionReachStats.question_number)).all()
+    dropoff = []
+    for index, row in enumerate(reached):
+        next_reached = reached[index + 1].sessions_reached if index + 1 < len(reached) else 0
+        # Sessions that stopped after this question either finished the intake or dropped off
+        dropoff.append({
+            "question_number": row.question_number,
+            "sessions_reached": row.sessions_reached,
+            "completed_after": row.sessions_completed_after,
+            "dropped_after": max(0, row.sessions_reached - next_reached - row.sessions_completed_after),
+        })
+
+    clients = db.exec(
+        select(ClientStats).order_by(ClientStats.proposals_generated.desc()).limit(top_clients)
+    ).all()
+
+    return {
+        "days": days,
+        "sessions_per_day": [
+            {
+                "day": row.day.isoformat(),
+                "sessions_started": row.sessions_started,
+                "sessions_completed": row.sessions_completed,
+                "chat_turns": row.chat_turns,
+                "proposals_generated": row.proposals_generated,
+            }
+            for row in daily
+        ],
+        "average_turns_to_completion": round(turns / completed, 2) if completed else None,
+        "dropoff_by_question": dropoff,
+        "proposals_per_client": [
+            {
+                "client_name": row.client_name,
+                "sessions_completed": row.sessions_completed,
+                "proposals_generated": row.proposals_generated,
+            }
+            for row in clients
+        ],
+    }
+
+
+if __name__ == "__main__":
+    import os
+    from dotenv import load_dotenv
+    from sqlmodel import SQLModel, create_engine
+
+    load_dotenv()
+    engine = create_engine(os.getenv("DATABASE_URL", ""))
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        rebuild_rollups(db)
+    print("✅ Rollups rebuilt")
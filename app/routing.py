@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from pydantic_ai.models.gemini import GeminiModel, GeminiModelSettings
+
+from .util import MODEL_SETTINGS
+
+# ─────────────── Task Routes ───────────────
+# Each task type has a primary model, a fallback model and its own settings. Short
+# chat turns run on the smaller model, proposal writing on the stronger one. Every
+# model name can be overridden with MODEL_<TASK> / MODEL_<TASK>_FALLBACK.
+
+CHAT_SETTINGS = GeminiModelSettings(
+    temperature=0.4,  # Questions should stay on-script
+    top_p=0.7,
+    frequency_penalty=0.5,
+    presence_penalty=0.5,
+)
+
+EXTRACTION_SETTINGS = GeminiModelSettings(
+    temperature=0.0,  # Extraction should be deterministic
+)
+
+
+@dataclass
+class Route:
+    primary: str
+    fallback: str
+    settings: GeminiModelSettings
+    max_p95_latency: float  # seconds before the primary is considered unhealthy
+
+
+def _route(task: str, primary: str, fallback: str, settings, max_p95_latency: float) -> Route:
+    key = task.upper()
+    return Route(
+        primary=os.getenv(f"MODEL_{key}", primary),
+        fallback=os.getenv(f"MODEL_{key}_FALLBACK", fallback),
+        settings=settings,
+        max_p95_latency=float(os.getenv(f"MODEL_{key}_MAX_P95_SECONDS", max_p95_latency)),
+    )
+
+
+TASK_ROUTES: Dict[str, Route] = {
+    "chat": _route("chat", "gemini-2.0-flash-lite", "gemini-2.0-flash", CHAT_SETTINGS, 8),
+    "extraction": _route("extraction", "gemini-2.0-flash", "gemini-2.0-flash-lite", EXTRACTION_SETTINGS, 20),
+    "proposal": _route("proposal", "gemini-2.0-flash", "gemini-2.0-flash-lite", MODEL_SETTINGS, 60),
+}
+
+
+# ─────────────── Circuit Breaker ───────────────
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass
+class CircuitBreaker:
+    """Trips when the primary's recent error rate or p95 latency crosses a threshold.
+
+    While open every call goes to the fallback. After `cooldown` seconds one probe call
+    is let through to the primary; if it succeeds the breaker closes again.
+    """
+
+    max_p95_latency: float
+    max_error_rate: float = float(os.getenv("BREAKER_MAX_ERROR_RATE", "0.5"))
+    min_calls: int = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+    cooldown: float = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+    window: int = 50
+    state: str = CLOSED
+    opened_at: float = 0.0
+    probing: bool = False
+    outcomes: deque = field(default_factory=deque)  # (ok, latency)
+
+    def allow_primary(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record(self, ok: bool, latency: float) -> None:
+        if self.state == HALF_OPEN:
+            self.probing = False
+            if ok and latency <= self.max_p95_latency:
+                logging.info("🟢 Circuit closed, primary model healthy again")
+                self.state = CLOSED
+                self.outcomes.clear()
+            else:
+                self._trip()
+            return
+        self.outcomes.append((ok, latency))
+        if len(self.outcomes) > self.window:
+            self.outcomes.popleft()
+        if len(self.outcomes) >= self.min_calls and (
+            self.error_rate() > self.max_error_rate or self.p95_latency() > self.max_p95_latency
+        ):
+            self._trip()
+
+    def _trip(self) -> None:
+        logging.warning(f"🔴 Circuit opened (error_rate={self.error_rate():.2f}, p95={self.p95_latency():.2f}s)")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+
+    def p95_latency(self) -> float:
+        latencies = sorted(latency for ok, latency in self.outcomes if ok)
+        if not latencies:
+            return 0.0
+        return latencies[max(0, int(len(latencies) * 0.95) - 1)]
+
+
+# ─────────────── Token Usage ───────────────
+# Callers that want per-session token counts (e.g. the simulated-user harness) set
+# `usage_tracker` to a dict; every routed call adds its usage to it.
+usage_tracker: ContextVar[Optional[dict]] = ContextVar("usage_tracker", default=None)
+
+
+def _token_counts(usage) -> tuple:
+    # pydantic_ai renamed request/response_tokens to input/output_tokens
+    prompt = getattr(usage, "input_tokens", None)
+    if prompt is None:
+        prompt = getattr(usage, "request_tokens", None)
+    completion = getattr(usage, "output_tokens", None)
+    if completion is None:
+        completion = getattr(usage, "response_tokens", None)
+    return prompt or 0, completion or 0
+
+
+def new_usage() -> dict:
+    return {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+def _add_usage(totals: dict, result) -> None:
+    prompt, completion = _token_counts(result.usage())
+    totals["requests"] += 1
+    totals["prompt_tokens"] += prompt
+    totals["completion_tokens"] += completion
+
+
+# ─────────────── Router ───────────────
+class ModelRouter:
+    def __init__(self, routes: Dict[str, Route]):
+        self.routes = routes
+        self.breakers = {task: CircuitBreaker(max_p95_latency=route.max_p95_latency) for task, route in routes.items()}
+        self.models: Dict[str, GeminiModel] = {}
+        self.decisions: Dict[str, Dict[str, int]] = {task: {} for task in routes}
+        self.failovers: Dict[str, int] = {task: 0 for task in routes}
+        self.usage: Dict[str, dict] = {task: new_usage() for task in routes}
+
+    def _model(self, name: str) -> GeminiModel:
+        if name not in self.models:
+            self.models[name] = GeminiModel(name)
+        return self.models[name]
+
+    def _count(self, task: str, model_name: str) -> None:
+        self.decisions[task][model_name] = self.decisions[task].get(model_name, 0) + 1
+
+    async def run(self, task: str, agent, *args, **kwargs):
+        """Call `agent.run(*args, **kwargs)` on the model picked for `task`.
+
+        Primary failures are recorded against the breaker and retried once on the fallback.
+        """
+        result = await self._run(task, agent, *args, **kwargs)
+        _add_usage(self.usage[task], result)
+        tracker = usage_tracker.get()
+        if tracker is not None:
+            _add_usage(tracker, result)
+        return result
+
+    async def _run(self, task: str, agent, *args, **kwargs):
+        route = self.routes[task]
+        breaker = self.breakers[task]
+        if breaker.allow_primary():
+            self._count(task, route.primary)
+            started = time.monotonic()
+            try:
+                result = await agent.run(*args, model=self._model(route.primary), model_settings=route.settings, **kwargs)
+            except asyncio.CancelledError:
+                # A call cancelled (by a deadline or a winning hedge) after running past the
+                # latency threshold is a slow primary; one cancelled sooner says nothing.
+                elapsed = time.monotonic() - started
+                if elapsed > route.max_p95_latency:
+                    breaker.record(False, elapsed)
+                elif breaker.state == HALF_OPEN:
+                    breaker.probing = False
+                raise
+            except Exception as exc:
+                breaker.record(False, time.monotonic() - started)
+                logging.warning(f"↪️ {task}: {route.primary} failed ({exc}), failing over to {route.fallback}")
+                self.failovers[task] += 1
+            else:
+                breaker.record(True, time.monotonic() - started)
+                return result
+
+        self._count(task, route.fallback)
+        return await agent.run(*args, model=self._model(route.fallback), model_settings=route.settings, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            task: {
+                "primary": route.primary,
+                "fallback": route.fallback,
+                "circuit": self.breakers[task].state,
+                "error_rate": round(self.breakers[task].error_rate(), 3),
+                "p95_latency_seconds": round(self.breakers[task].p95_latency(), 3),
+                "decisions": dict(self.decisions[task]),
+                "failovers": self.failovers[task],
+                "usage": dict(self.usage[task]),
+            }
+            for task, route in self.routes.items()
+        }
+
+
+model_router = ModelRouter(TASK_ROUTES)
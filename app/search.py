@@ -0,0 +1,424 @@
+import logging
+import random
+import re
+import statistics
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from .models import ChatHistoryTable, ProposalSession
+
+# ─────────────── Index Schema ───────────────
+# Every searchable thing (a proposal session or a single chat message) is one row in
+# `search_document`. SQLite mirrors it into an FTS5 table through triggers, Postgres
+# keeps a generated tsvector column with a GIN index. Either way the index is kept
+# up to date by upserting into `search_document` on every write.
+
+SEARCH_FIELDS = [
+    "client_name", "project_title", "problem_statement", "proposed_solution",
+    "previous_experience", "objectives", "implementation_plan",
+    "benefits", "timeline", "budget", "deliverables", "technologies",
+    "latest_proposal",
+]
+
+DOC_TYPES = ("proposal", "chat")
+
+SQLITE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_document (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        doc_type VARCHAR(16) NOT NULL,
+        doc_id VARCHAR(64) NOT NULL,
+        session_id VARCHAR(64) NOT NULL,
+        client_name TEXT NOT NULL DEFAULT '',
+        technologies TEXT NOT NULL DEFAULT '',
+        content TEXT NOT NULL DEFAULT '',
+        UNIQUE (doc_type, doc_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_document_session_id ON search_document (session_id)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        client_name, technologies, content,
+        content='search_document', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_document_ai AFTER INSERT ON search_document BEGIN
+        INSERT INTO search_fts (rowid, client_name, technologies, content)
+        VALUES (new.id, new.client_name, new.technologies, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_document_ad AFTER DELETE ON search_document BEGIN
+        INSERT INTO search_fts (search_fts, rowid, client_name, technologies, content)
+        VALUES ('delete', old.id, old.client_name, old.technologies, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_document_au AFTER UPDATE ON search_document BEGIN
+        INSERT INTO search_fts (search_fts, rowid, client_name, technologies, content)
+        VALUES ('delete', old.id, old.client_name, old.technologies, old.content);
+        INSERT INTO search_fts (rowid, client_name, technologies, content)
+        VALUES (new.id, new.client_name, new.technologies, new.content);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_document (
+        id BIGSERIAL PRIMARY KEY,
+        doc_type VARCHAR(16) NOT NULL,
+        doc_id VARCHAR(64) NOT NULL,
+        session_id VARCHAR(64) NOT NULL,
+        client_name TEXT NOT NULL DEFAULT '',
+        technologies TEXT NOT NULL DEFAULT '',
+        content TEXT NOT NULL DEFAULT '',
+        tsv tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(client_name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(technologies, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(content, '')), 'C')
+        ) STORED,
+        UNIQUE (doc_type, doc_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_document_session_id ON search_document (session_id)",
+    "CREATE INDEX IF NOT EXISTS ix_search_document_tsv ON search_document USING GIN (tsv)",
+]
+
+UPSERT_SQL = text("""
+    INSERT INTO search_document (doc_type, doc_id, session_id, client_name, technologies, content)
+    VALUES (:doc_type, :doc_id, :session_id, :client_name, :technologies, :content)
+    ON CONFLICT (doc_type, doc_id) DO UPDATE SET
+        session_id = excluded.session_id,
+        client_name = excluded.client_name,
+        technologies = excluded.technologies,
+        content = excluded.content
+""")
+
+# Chat rows are indexed before structured extraction fills in the client, so the
+# session's client/technologies are pushed down to its messages whenever they change.
+PROPAGATE_SQL = text("""
+    UPDATE search_document
+    SET client_name = :client_name, technologies = :technologies
+    WHERE session_id = :session_id AND doc_type = 'chat'
+      AND (client_name <> :client_name OR technologies <> :technologies)
+""")
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def ensure_search_index(engine) -> None:
+    """Create the search tables/indexes for the engine's dialect if they don't exist."""
+    ddl = POSTGRES_DDL if _dialect(engine) == "postgresql" else SQLITE_DDL
+    with engine.begin() as conn:
+        for statement in ddl:
+            conn.execute(text(statement))
+
+
+# ─────────────── Incremental Maintenance ───────────────
+def _session_content(session: ProposalSession) -> str:
+    parts = [session.title or ""]
+    parts.extend(str(getattr(session, field, None) or "") for field in SEARCH_FIELDS)
+    return "\n".join(part for part in parts if part)
+
+
+def index_session(db: Session, session: ProposalSession) -> None:
+    """Upsert the proposal document for a session. Caller commits."""
+    client_name = session.client_name or ""
+    technologies = session.technologies or ""
+    db.execute(UPSERT_SQL, {
+        "doc_type": "proposal",
+        "doc_id": session.session_id,
+        "session_id": session.session_id,
+        "client_name": client_name,
+        "technologies": technologies,
+        "content": _session_content(session),
+    })
+    db.execute(PROPAGATE_SQL, {
+        "session_id": session.session_id,
+        "client_name": client_name,
+        "technologies": technologies,
+    })
+
+
+def index_chat_message(db: Session, entry: ChatHistoryTable, session: Optional[ProposalSession] = None) -> None:
+    """Upsert a single chat message document. `entry.id` must be populated. Caller commits."""
+    db.execute(UPSERT_SQL, {
+        "doc_type": "chat",
+        "doc_id": str(entry.id),
+        "session_id": entry.session_id,
+        "client_name": (session.client_name if session else "") or "",
+        "technologies": (session.technologies if session else "") or "",
+        "content": entry.message or "",
+    })
+
+
+def reindex_all(db: Session, batch_size: int = 500) -> int:
+    """Rebuild the index from ProposalSession and ChatHistoryTable. Returns documents indexed."""
+    count = 0
+    sessions = {}
+    for session in db.exec(select(ProposalSession)).all():
+        index_session(db, session)
+        # Plain copies so later commits don't expire them and trigger a reload per message
+        sessions[session.session_id] = ProposalSession(
+            session_id=session.session_id,
+            client_name=session.client_name,
+            technologies=session.technologies,
+        )
+        count += 1
+    last_id = 0
+    while True:
+        entries = db.exec(
+            select(ChatHistoryTable)
+            .where(ChatHistoryTable.id > last_id)
+            .order_by(ChatHistoryTable.id)
+            .limit(batch_size)
+        ).all()
+        if not entries:
+            break
+        for entry in entries:
+            index_chat_message(db, entry, sessions.get(entry.session_id))
+            count += 1
+        last_id = entries[-1].id
+        db.commit()
+    db.commit()
+    return count
+
+
+def backfill_if_empty(engine) -> None:
+    """Populate the index on first startup against a database that already has data."""
+    with Session(engine) as db:
+        has_docs = db.execute(text("SELECT 1 FROM search_document LIMIT 1")).first()
+        has_sessions = db.exec(select(ProposalSession.session_id).limit(1)).first()
+        if has_docs or not has_sessions:
+            return
+        count = reindex_all(db)
+        logging.info(f"🔎 Search index backfilled with {count} documents")
+
+
+# ─────────────── Querying ───────────────
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# A quoted phrase (optionally negated) or a bare word, as in Postgres websearch_to_tsquery
+_QUERY_RE = re.compile(r'(-?)"([^"]*)"?|(\S+)')
+
+
+def _fts5_phrase(value: str) -> str:
+    tokens = _TOKEN_RE.findall(value)
+    return '"' + " ".join(tokens) + '"' if tokens else ""
+
+
+def _fts5_query(q: str, client: Optional[str], technology: Optional[str]) -> str:
+    """Translate websearch-style input into an FTS5 expression.
+
+    Mirrors websearch_to_tsquery on Postgres: words are ANDed, "quoted text" is a phrase,
+    `or` between two terms ORs them and a leading `-` excludes a term. Everything is
+    re-quoted from its word tokens so user input can never be parsed as FTS5 syntax.
+    """
+    groups = []  # each group is a list of phrases ORed together; groups are ANDed
+    excluded = []
+    pending_or = False
+    for match in _QUERY_RE.finditer(q):
+        negated, quoted, bare = match.groups()
+        if quoted is None:
+            if bare.lower() == "or":
+                pending_or = bool(groups)
+                continue
+            negated = bare.startswith("-")
+            phrase = _fts5_phrase(bare)
+        else:
+            phrase = _fts5_phrase(quoted)
+        if not phrase:
+            pending_or = False
+            continue
+        if negated:
+            excluded.append(phrase)
+        elif pending_or:
+            groups[-1].append(phrase)
+        else:
+            groups.append([phrase])
+        pending_or = False
+
+    terms = ["(" + " OR ".join(group) + ")" if len(group) > 1 else group[0] for group in groups]
+    if not terms:
+        return ""
+    if client and _fts5_phrase(client):
+        terms.append(f"client_name : {_fts5_phrase(client)}")
+    # Each technology is matched on its own so "React Postgres" finds "Postgres, React"
+    for token in _TOKEN_RE.findall(technology or ""):
+        terms.append(f'technologies : "{token}"')
+    expression = " AND ".join(terms)
+    if excluded and len(terms) > 1:
+        expression = f"({expression})"
+    for phrase in excluded:
+        expression = f"{expression} NOT {phrase}"
+    return expression
+
+
+def _search_sqlite(db, q, doc_type, client, technology, limit, offset):
+    match = _fts5_query(q, client, technology)
+    if not match:
+        return []
+    sql = """
+        SELECT d.doc_type, d.doc_id, d.session_id, d.client_name,
+               -bm25(search_fts, 10.0, 5.0, 1.0) AS score,
+               snippet(search_fts, 2, '<b>', '</b>', '…', 16) AS snippet
+        FROM search_fts
+        JOIN search_document d ON d.id = search_fts.rowid
+        WHERE search_fts MATCH :match
+    """
+    params = {"match": match, "limit": limit, "offset": offset}
+    if doc_type:
+        sql += " AND d.doc_type = :doc_type"
+        params["doc_type"] = doc_type
+    sql += " ORDER BY bm25(search_fts, 10.0, 5.0, 1.0) LIMIT :limit OFFSET :offset"
+    return db.execute(text(sql), params).all()
+
+
+def _search_postgres(db, q, doc_type, client, technology, limit, offset):
+    sql = """
+        SELECT doc_type, doc_id, session_id, client_name,
+               ts_rank_cd(tsv, query) AS score,
+               ts_headline('english', content, query,
+                           'StartSel=<b>, StopSel=</b>, MaxFragments=1, MaxWords=24, MinWords=8') AS snippet
+        FROM search_document, websearch_to_tsquery('english', :q) AS query
+        WHERE tsv @@ query
+    """
+    params = {"q": q, "limit": limit, "offset": offset}
+    if doc_type:
+        sql += " AND doc_type = :doc_type"
+        params["doc_type"] = doc_type
+    # Same semantics as the FTS5 column filters: client is a word phrase, technologies must all appear
+    if client:
+        sql += " AND to_tsvector('english', client_name) @@ phraseto_tsquery('english', :client)"
+        params["client"] = client
+    if technology:
+        sql += " AND to_tsvector('english', technologies) @@ plainto_tsquery('english', :technology)"
+        params["technology"] = technology
+    sql += " ORDER BY score DESC LIMIT :limit OFFSET :offset"
+    return db.execute(text(sql), params).all()
+
+
+def search_documents(
+    db: Session,
+    q: str,
+    doc_type: Optional[str] = None,
+    client: Optional[str] = None,
+    technology: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[dict]:
+    """Ranked full-text search over proposals and chat messages, with highlighted snippets."""
+    if _dialect(db.get_bind()) == "postgresql":
+        rows = _search_postgres(db, q, doc_type, client, technology, limit, offset)
+    else:
+        rows = _search_sqlite(db, q, doc_type, client, technology, limit, offset)
+    return [
+        {
+            "type": row.doc_type,
+            "id": row.doc_id,
+            "session_id": row.session_id,
+            "client_name": row.client_name,
+            "score": round(float(row.score), 4),
+            "snippet": row.snippet,
+        }
+        for row in rows
+    ]
+
+
+# ─────────────── Benchmark ───────────────
+CLIENTS = ["Acme Health", "Northwind", "SRH", "Globex", "Initech", "Umbrella Clinics", "Hooli", "Stark Logistics"]
+STACKS = ["React", "Postgres", "Django", "FastAPI", "Vue", "MongoDB", "Kubernetes", "AWS", "Flutter", "Redis"]
+DOMAINS = ["healthcare", "education", "retail", "logistics", "fintech", "hiring", "insurance"]
+WORDS = ("system platform dashboard patient workflow reporting integration portal automation "
+         "analytics mobile scheduling billing compliance onboarding inventory tracking").split()
+
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def benchmark(sessions: int = 5000, messages_per_session: int = 20, queries: int = 200) -> None:
+    """Build a synthetic corpus in an in-memory SQLite DB and time indexing and queries."""
+    from sqlmodel import SQLModel, create_engine
+
+    rng = random.Random(42)
+    phrases = []  # word pairs that occur in the corpus, for the quoted-phrase queries
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    ensure_search_index(engine)
+
+    started = time.perf_counter()
+    with Session(engine) as db:
+        for i in range(sessions):
+            stack = ", ".join(rng.sample(STACKS, 3))
+            domain = rng.choice(DOMAINS)
+            solution = _sentence(rng, 30)
+            if i % 50 == 0:
+                words = solution.split()
+                start = rng.randrange(len(words) - 1)
+                phrases.append(" ".join(words[start:start + 2]))
+            session = ProposalSession(
+                session_id=f"s{i}",
+                client_name=rng.choice(CLIENTS),
+                project_title=f"{domain.title()} {rng.choice(WORDS)} project",
+                problem_statement=f"{domain} {_sentence(rng)}",
+                proposed_solution=solution,
+                technologies=stack,
+            )
+            db.add(session)
+            db.flush()
+            index_session(db, session)
+            for _ in range(messages_per_session):
+                entry = ChatHistoryTable(message=_sentence(rng, 20), session_id=session.session_id,
+                                         role=rng.choice(["user", "assistant"]))
+                db.add(entry)
+                db.flush()
+                index_chat_message(db, entry, session)
+            if i % 500 == 0:
+                db.commit()
+        db.commit()
+    index_seconds = time.perf_counter() - started
+    total_docs = sessions * (messages_per_session + 1)
+    print(f"Indexed {total_docs} documents in {index_seconds:.2f}s "
+          f"({total_docs / index_seconds:.0f} docs/s)")
+
+    def timed(fn) -> List[float]:
+        latencies = []
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            fn()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        return latencies
+
+    def report(name: str, latencies: List[float]) -> None:
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{name:<28} p50={statistics.median(latencies):7.2f}ms p95={p95:7.2f}ms")
+
+    with Session(engine) as db:
+        report("fts: terms", timed(lambda: search_documents(db, rng.choice(DOMAINS) + " " + rng.choice(WORDS))))
+        report("fts: quoted phrase", timed(lambda: search_documents(db, f'"{rng.choice(phrases)}"')))
+        report("fts: react+postgres filter", timed(lambda: search_documents(
+            db, "healthcare", doc_type="proposal", technology="React Postgres")))
+        report("fts: client filter", timed(lambda: search_documents(db, rng.choice(WORDS), client="Acme Health")))
+        report("scan: LIKE baseline", timed(lambda: db.execute(text(
+            "SELECT session_id FROM chathistorytable WHERE message LIKE :p LIMIT 20"),
+            {"p": f"%{rng.choice(DOMAINS)} {rng.choice(WORDS)}%"}).all()))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the proposal search index")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    benchmark(args.sessions, args.messages, args.queries)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+from .deadline import DEADLINE_BUDGETS, Deadline, DeadlineExceeded
+from .idempotency import fingerprint_request
+from .routing import usage_tracker
+
+# ─────────────── Speculative Generation ───────────────
+# Nearly every finished intake is followed by a default-style /generate. As soon as
+# structured extraction finishes we start that generation in the background, keyed by
+# a fingerprint of the extracted fields. /generate without style or tone then attaches
+# to the in-flight task or takes its result. If the fields change first, the task is
+# cancelled, and a result whose fingerprint no longer matches is never stored or served.
+
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "true").lower() in ("1", "true", "yes")
+RESULT_TTL_SECONDS = float(os.getenv("SPECULATIVE_RESULT_TTL_SECONDS", "900"))
+
+
+@dataclass
+class Speculation:
+    fingerprint: str
+    task: asyncio.Task
+    started_at: float = field(default_factory=time.monotonic)
+
+
+class SpeculativeGenerations:
+    """Per-process registry of background proposal generations, one per session."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.entries: Dict[str, Speculation] = {}
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        for session_id, entry in list(self.entries.items()):
+            if entry.task.done() and now - entry.started_at > RESULT_TTL_SECONDS:
+                del self.entries[session_id]
+
+    def discard(self, session_id: str) -> None:
+        entry = self.entries.pop(session_id, None)
+        if entry is not None:
+            self.discarded += 1
+            entry.task.cancel()
+
+    def start(
+        self,
+        session_id: str,
+        base_data: dict,
+        generate: Callable[[], Awaitable[str]],
+        store: Callable[[str, str], None],
+    ) -> None:
+        """Start `generate()` in the background and `store(fingerprint, text)` its result."""
+        if not self.enabled:
+            return
+        self._purge_expired()
+        self.discard(session_id)
+        fingerprint = fingerprint_request(base_data)
+
+        async def run() -> str:
+            # The task copies the caller's context; its tokens belong to no caller's tally
+            usage_tracker.set(None)
+            deadline = Deadline(DEADLINE_BUDGETS["generate"])
+            text = await deadline.run(generate())
+            store(fingerprint, text)
+            return text
+
+        task = asyncio.ensure_future(run())
+        task.add_done_callback(lambda done: _log_failure(session_id, done))
+        self.entries[session_id] = Speculation(fingerprint=fingerprint, task=task)
+        self.started += 1
+        logging.info(f"🚀 Speculative proposal generation started for session {session_id}")
+
+    async def claim(self, session_id: str, base_data: dict, deadline: Deadline) -> Optional[str]:
+        """Return the speculative proposal for these exact fields, waiting for it if still running.
+
+        Returns None when there is nothing usable, so the caller generates as usual.
+        """
+        entry = self.entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.fingerprint != fingerprint_request(base_data):
+            self.discard(session_id)
+            self.misses += 1
+            return None
+        try:
+            # Shielded so a client giving up on /generate doesn't cancel the shared work
+            text = await deadline.run(asyncio.shield(entry.task))
+        except DeadlineExceeded:
+            if deadline.remaining() <= 0:
+                raise
+            # The background task ran out of its own budget; this request still has time
+            self.entries.pop(session_id, None)
+            self.misses += 1
+            return None
+        except BaseException:
+            if entry.task.cancelled() or entry.task.done():
+                self.entries.pop(session_id, None)
+                self.misses += 1
+                return None
+            raise
+        self.entries.pop(session_id, None)
+        self.hits += 1
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": sum(1 for entry in self.entries.values() if not entry.task.done()),
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "discarded": self.discarded,
+        }
+
+
+def _log_failure(session_id: str, task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logging.warning(f"⚠️ Speculative generation failed for session {session_id}: {exc!r}")
+
+
+speculative_generations = SpeculativeGenerations(enabled=SPECULATIVE_GENERATION)
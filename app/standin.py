@@ -0,0 +1,97 @@
+import asyncio
+from contextlib import ExitStack, contextmanager
+from typing import List, Optional
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from .schemas import ProposalInput
+
+# ─────────────── Local Model Stand-in ───────────────
+# A FunctionModel that answers every agent without calling Gemini: structured agents
+# get placeholder values for every field of their output schema, text agents get a
+# short canned reply. `latency` simulates a slow upstream model.
+
+
+def _placeholder(schema: dict, name: str):
+    # Optional[...] fields come through as anyOf [..., {"type": "null"}]
+    for variant in schema.get("anyOf", []):
+        if variant.get("type") != "null":
+            return _placeholder(variant, name)
+    kind = schema.get("type")
+    if kind == "boolean":
+        return False
+    if kind == "integer":
+        return 0
+    if kind == "number":
+        return 0.0
+    if kind == "array":
+        return []
+    return f"stand-in {name}"
+
+
+def _placeholder_args(parameters: dict) -> dict:
+    properties = parameters.get("properties", {})
+    return {name: _placeholder(schema, name) for name, schema in properties.items()}
+
+
+def slow_model(latency: float = 1.0, capacity: Optional[int] = None) -> FunctionModel:
+    """`capacity` caps concurrent calls like an upstream quota; extra calls queue and get slower."""
+    slots = asyncio.Semaphore(capacity) if capacity else None
+
+    async def respond(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if slots is not None:
+            async with slots:
+                await asyncio.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+        if info.output_tools:
+            tool = info.output_tools[0]
+            return ModelResponse(parts=[ToolCallPart(tool.name, _placeholder_args(tool.parameters_json_schema))])
+        return ModelResponse(parts=[TextPart("# Executive Summary\nStand-in proposal text.")])
+
+    return FunctionModel(respond)
+
+
+INTAKE_FIELDS = list(ProposalInput.model_fields)
+
+
+def intake_model(min_questions: int = 12, fields_per_question: int = 1) -> FunctionModel:
+    """Deterministic chat model that follows the intake rules without calling Gemini.
+
+    It asks for `fields_per_question` fields per turn, in order, and sets done=true once
+    every field has been asked and at least `min_questions` questions were asked. Each
+    question names its fields (e.g. "client_name") so scripted personas can answer them.
+    """
+    async def respond(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if not info.output_tools:
+            return ModelResponse(parts=[TextPart("# Executive Summary\nStand-in proposal text.")])
+        tool = info.output_tools[0]
+        if "question" not in tool.parameters_json_schema.get("properties", {}):
+            return ModelResponse(parts=[ToolCallPart(tool.name, _placeholder_args(tool.parameters_json_schema))])
+
+        asked = sum(1 for message in messages if isinstance(message, ModelResponse))
+        start = asked * fields_per_question
+        if start >= len(INTAKE_FIELDS) and asked >= min_questions:
+            args = {"reason": "All fields collected.", "question": "All done.", "done": True}
+        elif start >= len(INTAKE_FIELDS):
+            args = {"reason": "Confirming details.", "question": "Is there anything you would like to add?", "done": False}
+        else:
+            fields = INTAKE_FIELDS[start:start + fields_per_question]
+            args = {"reason": f"Collecting {', '.join(fields)}.",
+                    "question": f"Please describe the {' and '.join(fields)}.", "done": False}
+        return ModelResponse(parts=[ToolCallPart(tool.name, args)])
+
+    return FunctionModel(respond)
+
+
+@contextmanager
+def override_agents(model):
+    """Point the chat, extraction and proposal agents at `model` for the duration of the block."""
+    from .util import agent as proposal_agent
+    from .utils import chat_agent, structured_agent
+
+    with ExitStack() as stack:
+        for agent in (chat_agent, structured_agent, proposal_agent):
+            stack.enter_context(agent.override(model=model))
+        yield
@@ -0,0 +1,6 @@
+import os
+
+# app.util builds its Gemini model at import time and app.api its engine; neither is
+# contacted by the unit tests, but both need these set before the modules import.
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
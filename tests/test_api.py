@@ -0,0 +1,143 @@
+import asyncio
+
+import httpx
+import pytest
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+from sqlmodel import Session, create_engine, select
+
+from app import api, main
+from app.concurrency import concurrency_limiter, pool_capacity
+from app.models import ChatHistoryTable, ProposalSession
+from app.standin import _placeholder_args, intake_model, override_agents, slow_model
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # A file database: the app touches it from the event loop and from worker threads
+    engine = create_engine(f"sqlite:///{tmp_path}/api.db")
+    monkeypatch.setattr(api, "engine", engine)
+    monkeypatch.setattr(main, "engine", engine)
+    main.on_startup()
+    return engine
+
+
+async def _request(method: str, path: str, latency: float = 0.0, model=None, **kwargs) -> httpx.Response:
+    with override_agents(model or slow_model(latency)):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+
+
+def _history(engine, session_id):
+    with Session(engine) as db:
+        entries = db.exec(
+            select(ChatHistoryTable).where(ChatHistoryTable.session_id == session_id).order_by(ChatHistoryTable.id)
+        ).all()
+        return [(entry.role, entry.message) for entry in entries]
+
+
+def test_retry_after_timeout_stores_the_answer_once(engine):
+    async def scenario():
+        started = await _request("POST", "/start_proposal")
+        session_id = started.json()["session_id"]
+        timed_out = await _request(
+            "POST", f"/continue_proposal/{session_id}", latency=0.5, json={"response": "Acme"},
+            headers={"Idempotency-Key": "k1", "X-Request-Timeout-Ms": "100"},
+        )
+        retried = await _request(
+            "POST", f"/continue_proposal/{session_id}", json={"response": "Acme"},
+            headers={"Idempotency-Key": "k1"},
+        )
+        return session_id, timed_out, retried
+
+    session_id, timed_out, retried = asyncio.run(scenario())
+    assert timed_out.status_code == 504
+    assert retried.status_code == 200
+    assert [role for role, _ in _history(engine, session_id)] == ["assistant", "user", "assistant"]
+    assert _history(engine, session_id)[1] == ("user", "Acme")
+
+
+def test_replayed_key_does_not_store_the_answer_again(engine):
+    async def scenario():
+        started = await _request("POST", "/start_proposal")
+        session_id = started.json()["session_id"]
+        for _ in range(2):
+            response = await _request(
+                "POST", f"/continue_proposal/{session_id}", json={"response": "Acme"},
+                headers={"Idempotency-Key": "k2"},
+            )
+        return session_id, response
+
+    session_id, replayed = asyncio.run(scenario())
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert len(_history(engine, session_id)) == 3
+
+
+def _slow_extraction(latency: float) -> FunctionModel:
+    """Chat turns finish the intake at once; structured extraction takes `latency` seconds."""
+    chat = intake_model(min_questions=0, fields_per_question=100)
+
+    async def respond(messages, info):
+        tool = info.output_tools[0]
+        if "question" in tool.parameters_json_schema.get("properties", {}):
+            return await chat.function(messages, info)
+        await asyncio.sleep(latency)
+        return ModelResponse(parts=[ToolCallPart(tool.name, _placeholder_args(tool.parameters_json_schema))])
+
+    return FunctionModel(respond)
+
+
+def test_extraction_timeout_fails_the_turn_without_saving_it(engine):
+    async def scenario():
+        started = await _request("POST", "/start_proposal")
+        session_id = started.json()["session_id"]
+        timed_out = await _request(
+            "POST", f"/continue_proposal/{session_id}", model=_slow_extraction(0.5),
+            json={"response": "Acme"}, headers={"Idempotency-Key": "k3", "X-Request-Timeout-Ms": "200"},
+        )
+        saved_after_timeout = _history(engine, session_id)
+        retried = await _request(
+            "POST", f"/continue_proposal/{session_id}", model=_slow_extraction(0),
+            json={"response": "Acme"}, headers={"Idempotency-Key": "k3"},
+        )
+        return session_id, timed_out, saved_after_timeout, retried
+
+    session_id, timed_out, saved_after_timeout, retried = asyncio.run(scenario())
+    assert timed_out.status_code == 504
+    assert [role for role, _ in saved_after_timeout] == ["assistant"]
+    assert retried.status_code == 200 and "All done" in retried.text
+    assert [role for role, _ in _history(engine, session_id)] == ["assistant", "user", "assistant"]
+    with Session(engine) as db:
+        session = db.get(ProposalSession, session_id)
+        assert session.progress == 100
+        assert session.completed_at is not None
+        assert session.client_name.startswith("stand-in")
+
+
+def test_small_db_pool_does_not_stall_concurrent_requests(tmp_path, monkeypatch):
+    # Far more requests than connections: they must queue for the pool, not freeze the loop
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", pool_size=3, max_overflow=0, pool_timeout=2)
+    monkeypatch.setattr(api, "engine", engine)
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(concurrency_limiter, "db_sessions", None)
+    monkeypatch.setattr(concurrency_limiter, "db_slots", None)
+    main.on_startup()
+    concurrency_limiter.limit_db_sessions(pool_capacity(engine))
+
+    async def scenario():
+        started = await _request("POST", "/start_proposal")
+        session_id = started.json()["session_id"]
+        with override_agents(slow_model(0.3)):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(
+                    client.post(f"/continue_proposal/{session_id}", json={"response": f"answer {i}"})
+                    for i in range(8)
+                ), *(
+                    client.post(f"/proposal/{session_id}/generate", json={"style": "brief"})
+                    for _ in range(4)
+                ))
+
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 12
@@ -0,0 +1,154 @@
+import asyncio
+
+from sqlmodel import create_engine
+
+from app.concurrency import (
+    CHAT, EXPORT, GENERATION, READ, AdaptiveConcurrencyMiddleware, AdaptiveLimit, ConcurrencyLimiter, classify,
+    pool_capacity,
+)
+
+
+def _warm(limit: AdaptiveLimit, latency: float = 1.0, samples: int = 100):
+    limit.long.extend([latency] * samples)
+    limit.short.extend([latency] * samples)
+
+
+def test_classify_routes():
+    assert classify("POST", "/continue_proposal/abc") == CHAT
+    assert classify("POST", "/proposal/abc/generate") == GENERATION
+    assert classify("GET", "/export") == EXPORT
+    assert classify("GET", "/search") == READ
+
+
+def test_latency_spike_at_light_load_keeps_limit():
+    limit = AdaptiveLimit(initial=20, min_limit=2, max_limit=200)
+    _warm(limit)
+    limit.inflight = 2
+    for _ in range(50):
+        limit.on_complete(5.0, ok=True)  # Upstream got slower, but nothing is queueing here
+    assert limit.limit == 20
+
+
+def test_failures_at_light_load_keep_limit():
+    limit = AdaptiveLimit(initial=20, min_limit=2, max_limit=200)
+    limit.inflight = 1
+    limit.on_complete(0.1, ok=False)
+    assert limit.limit == 20
+
+
+def test_queueing_near_limit_backs_off():
+    limit = AdaptiveLimit(initial=20, min_limit=2, max_limit=200)
+    _warm(limit)
+    limit.inflight = 19
+    for _ in range(limit.short.maxlen):
+        limit.on_complete(3.0, ok=True)
+    assert limit.queueing()
+    assert limit.limit < 20
+
+
+def test_steady_latency_near_limit_grows():
+    limit = AdaptiveLimit(initial=20, min_limit=2, max_limit=200)
+    _warm(limit)
+    limit.inflight = 19
+    for _ in range(20):
+        limit.on_complete(1.1, ok=True)
+    assert limit.limit > 20
+
+
+def test_backoff_never_goes_below_min_limit():
+    limit = AdaptiveLimit(initial=3, min_limit=2, max_limit=10)
+    limit.inflight = 3
+    for _ in range(10):
+        limit.last_decrease = 0.0
+        limit.on_complete(0.1, ok=False)
+    assert limit.limit == 2
+
+
+def _limiter(**limits):
+    return ConcurrencyLimiter(
+        {route_class: AdaptiveLimit(initial=limits.get(route_class, 10), min_limit=1, max_limit=100)
+         for route_class in (CHAT, GENERATION, EXPORT, READ)},
+        max_inflight=100,
+    )
+
+
+def test_limiter_sheds_over_limit_and_releases():
+    limiter = _limiter(chat=2)
+    assert limiter.try_acquire(CHAT) and limiter.try_acquire(CHAT)
+    assert not limiter.try_acquire(CHAT)
+    assert limiter.limits[CHAT].shed == 1
+    limiter.release(CHAT, 0.1)
+    assert limiter.try_acquire(CHAT)
+
+
+def _run_middleware(limiter, status: int, path: str = "/search"):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = AdaptiveConcurrencyMiddleware(app, limiter)
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": path}, None, send))
+    return sent
+
+
+def test_client_errors_are_not_latency_samples():
+    limiter = _limiter()
+    _run_middleware(limiter, 404)
+    _run_middleware(limiter, 422)
+    assert list(limiter.limits[READ].long) == []
+    assert limiter.limits[READ].inflight == 0
+
+    _run_middleware(limiter, 200)
+    assert len(limiter.limits[READ].long) == 1
+
+
+def test_exports_are_limited_but_not_latency_samples():
+    limiter = _limiter(export=1)
+    _run_middleware(limiter, 200, path="/export")
+    assert list(limiter.limits[EXPORT].long) == []
+    assert list(limiter.limits[GENERATION].long) == []
+    assert limiter.limits[EXPORT].admitted == 1
+
+
+def test_shed_request_gets_503_with_retry_after():
+    limiter = _limiter(read=0)
+    sent = _run_middleware(limiter, 200)
+    assert sent[0]["status"] == 503
+    assert (b"retry-after", b"1") in sent[0]["headers"]
+
+
+def test_pool_capacity(tmp_path):
+    assert pool_capacity(create_engine(f"sqlite:///{tmp_path}/db", pool_size=2, max_overflow=3)) == 5
+    assert pool_capacity(create_engine("sqlite://")) is None
+
+
+def test_requests_wait_for_a_db_slot_instead_of_exceeding_the_pool():
+    limiter = _limiter()
+    limiter.enabled = False  # Even with shedding off the pool is never oversubscribed
+    limiter.limit_db_sessions(3)
+    inside = {"now": 0, "max": 0}
+
+    async def app(scope, receive, send):
+        inside["now"] += 1
+        inside["max"] = max(inside["max"], inside["now"])
+        await asyncio.sleep(0.01)
+        inside["now"] -= 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    async def scenario():
+        middleware = AdaptiveConcurrencyMiddleware(app, limiter)
+        scope = {"type": "http", "method": "POST", "path": "/continue_proposal/s1"}
+        await asyncio.gather(*(middleware(scope, None, send) for _ in range(10)))
+
+    asyncio.run(scenario())
+    assert inside["max"] == 2  # One connection stays free for background work
+    assert limiter.limits[CHAT].admitted == 10
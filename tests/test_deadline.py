@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.deadline import Deadline, DeadlineExceeded, HedgedRunner
+
+
+def _runner(**kwargs):
+    # min_samples=1 with a seeded latency makes the hedge delay deterministic
+    runner = HedgedRunner("test", enabled=True, min_samples=1, **kwargs)
+    runner.latencies.append(0.01)
+    return runner
+
+
+def _call(latencies):
+    """Each call sleeps for the next latency in the list and returns its attempt number."""
+    attempts = []
+
+    async def call():
+        attempt = len(attempts)
+        attempts.append(attempt)
+        await asyncio.sleep(latencies[attempt] if attempt < len(latencies) else 0)
+        return attempt
+
+    return call, attempts
+
+
+def test_deadline_cancels_slow_call():
+    async def scenario():
+        await Deadline(0.01).run(asyncio.sleep(1))
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+
+
+def test_deadline_rejects_call_when_budget_is_spent():
+    deadline = Deadline(0)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(deadline.run(asyncio.sleep(0)))
+
+
+def test_slow_call_is_hedged_and_hedge_wins():
+    runner = _runner(max_hedge_ratio=1.0)
+    call, attempts = _call([1.0, 0.0])
+
+    result = asyncio.run(runner.run(call, Deadline(5)))
+    assert result == 1
+    assert attempts == [0, 1]
+    assert runner.hedges == 1 and runner.hedge_wins == 1
+
+
+def test_fast_call_is_not_hedged():
+    runner = _runner(max_hedge_ratio=1.0)
+    call, attempts = _call([0.0])
+
+    assert asyncio.run(runner.run(call, Deadline(5))) == 0
+    assert attempts == [0]
+    assert runner.hedges == 0
+
+
+def test_quiet_period_does_not_bank_hedges_for_a_burst():
+    runner = _runner(max_hedge_ratio=0.1, max_hedge_burst=2)
+
+    async def scenario():
+        for _ in range(1000):
+            call, _ = _call([0.0])
+            await runner.run(call, Deadline(5))
+        # The model slows down for everyone: 20 slow calls in a row
+        for _ in range(20):
+            call, _ = _call([0.05, 0.0])
+            await runner.run(call, Deadline(5))
+
+    asyncio.run(scenario())
+    # A lifetime 10% ratio would have allowed every one of the 20 to hedge
+    assert 1 <= runner.hedges <= 2 + 0.1 * 20
+    assert runner.hedges_skipped > 0
+
+
+def test_deadline_still_bounds_hedged_call():
+    runner = _runner(max_hedge_ratio=1.0)
+    call, _ = _call([1.0, 1.0])
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(runner.run(call, Deadline(0.1)))
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, update
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.export import ensure_export_indexes, export_stream, export_watermark, iter_session_batches
+from app.models import ChatHistoryTable, ProposalSession
+
+T0 = datetime(2025, 7, 1)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        for i in range(5):
+            session.add(ProposalSession(session_id=f"s{i}", client_name=f"Client {i}",
+                                        created_at=T0, updated_at=T0 + timedelta(hours=i)))
+        session.commit()
+        for i in range(5):
+            for n in range(i):
+                session.add(ChatHistoryTable(session_id=f"s{i}", role="user", message=f"m{i}-{n}"))
+        session.commit()
+        yield session
+
+
+def test_batches_page_through_every_session_with_its_messages(db):
+    batches = list(iter_session_batches(db, batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    sessions = [session for batch in batches for session in batch]
+    assert [session["session_id"] for session in sessions] == ["s0", "s1", "s2", "s3", "s4"]
+    assert [m["message"] for m in sessions[3]["messages"]] == ["m3-0", "m3-1", "m3-2"]
+
+
+def test_since_and_until_bound_the_export(db):
+    batches = iter_session_batches(db, since=T0 + timedelta(hours=1), until=T0 + timedelta(hours=3))
+    assert [s["session_id"] for batch in batches for s in batch] == ["s2", "s3"]
+
+
+def test_keyset_paging_handles_equal_timestamps(db):
+    db.exec(update(ProposalSession).values(updated_at=T0))
+    db.commit()
+
+    batches = iter_session_batches(db, batch_size=2)
+    assert sorted(s["session_id"] for batch in batches for s in batch) == ["s0", "s1", "s2", "s3", "s4"]
+
+
+def test_jsonl_has_one_line_per_session(db):
+    lines = b"".join(export_stream(db, "jsonl")).decode().splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[2])["messages"][1]["message"] == "m2-1"
+
+
+def test_csv_has_one_row_per_message_and_keeps_empty_sessions(db):
+    rows = list(csv.DictReader(io.StringIO(b"".join(export_stream(db, "csv", batch_size=2)).decode())))
+    # s0 has no messages but still gets a row; s1..s4 have 1+2+3+4 messages
+    assert len(rows) == 1 + 10
+    assert rows[0]["session_id"] == "s0" and rows[0]["message"] == ""
+
+
+def test_parquet_round_trips(db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(b"".join(export_stream(db, "parquet", batch_size=2))))
+    assert table.num_rows == 11
+
+
+def test_export_indexes_are_created_on_existing_tables():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE proposalsession (session_id VARCHAR PRIMARY KEY, updated_at DATETIME)")
+        conn.exec_driver_sql("CREATE TABLE chathistorytable (id INTEGER PRIMARY KEY, session_id VARCHAR)")
+
+    ensure_export_indexes(engine)
+    ensure_export_indexes(engine)  # idempotent
+
+    inspector = inspect(engine)
+    assert "ix_proposalsession_updated_at" in {ix["name"] for ix in inspector.get_indexes("proposalsession")}
+    assert "ix_chathistorytable_session_id" in {ix["name"] for ix in inspector.get_indexes("chathistorytable")}
+
+
+def test_write_committed_during_export_is_in_the_next_one(engine):
+    # Stamped just before the export started, committed after it finished
+    stamped = datetime.utcnow() - timedelta(seconds=5)
+    with Session(engine) as db:
+        until = export_watermark()
+        first = [s["session_id"] for batch in iter_session_batches(db, until=until) for s in batch]
+        db.add(ProposalSession(session_id="late", updated_at=stamped))
+        db.commit()
+        second = [s["session_id"] for batch in iter_session_batches(db, since=until) for s in batch]
+    assert "late" not in first
+    assert second == ["late"]
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from sqlmodel import Session, create_engine, select
+
+from app import api, main
+from app.concurrency import concurrency_limiter
+from app.harness import FALLBACK_ANSWER, _is_done, answer_for, run
+from app.models import ProposalSession
+from app.speculative import speculative_generations
+
+PERSONA = {
+    "name": "terse-founder",
+    "answers": {"client_name": "Acme Health", "project_title": "Patient Portal", "budget": "$80k."},
+}
+
+
+def test_answer_for_list_answers_in_order_then_falls_back():
+    persona = {"name": "scripted", "answers": ["first", "second"]}
+    assert answer_for(persona, "Anything", 0) == "first"
+    assert answer_for(persona, "Anything", 1) == "second"
+    assert answer_for(persona, "Anything", 2) == FALLBACK_ANSWER
+
+
+def test_answer_for_dict_answers_the_field_the_question_names():
+    assert answer_for(PERSONA, "Please describe the client_name.", 0) == "Acme Health"
+    assert answer_for(PERSONA, "What is the project title?", 5) == "Patient Portal"
+    assert answer_for(PERSONA, "What's your BUDGET?", 1) == "$80k."
+    assert answer_for(PERSONA, "Which technologies do you use?", 2) == FALLBACK_ANSWER
+
+
+def test_is_done():
+    assert _is_done("All done.", 40)
+    assert _is_done("Anything else?", 100)
+    assert not _is_done("Please describe the budget.", 90)
+
+
+def test_run_completes_a_persona_against_the_intake_model(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/harness.db")
+    monkeypatch.setattr(api, "engine", engine)
+    monkeypatch.setattr(main, "engine", engine)
+    # run() points DATABASE_URL at its database and switches these off for the whole process
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/harness.db")
+    monkeypatch.setattr(concurrency_limiter, "enabled", concurrency_limiter.enabled)
+    monkeypatch.setattr(speculative_generations, "enabled", speculative_generations.enabled)
+    personas = tmp_path / "personas.jsonl"
+    personas.write_text(json.dumps(PERSONA) + "\n")
+    output = tmp_path / "results.jsonl"
+
+    rows = asyncio.run(run(personas, "local", max_turns=10, min_questions=3, fields_per_question=4,
+                           output=str(output), database_url=f"sqlite:///{tmp_path}/harness.db"))
+
+    assert len(rows) == 1
+    row = rows[0]
+    assert row["persona"] == "terse-founder"
+    assert row["error"] is None
+    assert row["done"]
+    assert 3 <= row["turns"] < 10
+    assert row["model_requests"] > row["turns"]  # The opening question plus one per turn, at least
+    assert [json.loads(line) for line in output.read_text().splitlines()] == rows
+    with Session(engine) as db:
+        session = db.exec(select(ProposalSession)).one()
+    assert session.progress == 100
+    assert session.client_name
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app import idempotency
+from app.idempotency import InMemoryIdempotencyStore, run_idempotent
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _handler(calls, text="next question", delay=0.0):
+    async def handler():
+        calls.append(text)
+        await asyncio.sleep(delay)
+        return PlainTextResponse(text)
+    return handler
+
+
+def test_replayed_key_returns_stored_response_without_running_handler():
+    store = InMemoryIdempotencyStore()
+    calls = []
+
+    async def scenario():
+        first = await run_idempotent("k", "fp", _handler(calls), store=store)
+        second = await run_idempotent("k", "fp", _handler(calls, "other"), store=store)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert calls == ["next question"]
+    assert second.body == first.body
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
+def test_retry_waits_for_in_flight_request():
+    store = InMemoryIdempotencyStore()
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(
+            run_idempotent("k", "fp", _handler(calls, delay=0.05), store=store),
+            run_idempotent("k", "fp", _handler(calls, delay=0.05), store=store),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert first.body == second.body == b"next question"
+
+
+def test_key_reused_with_different_request_is_rejected():
+    store = InMemoryIdempotencyStore()
+
+    async def scenario():
+        await run_idempotent("k", "fp", _handler([]), store=store)
+        await run_idempotent("k", "other-fp", _handler([]), store=store)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(scenario())
+    assert exc.value.status_code == 422
+
+
+def test_failed_request_releases_key():
+    store = InMemoryIdempotencyStore()
+    calls = []
+
+    async def failing():
+        calls.append("fail")
+        raise RuntimeError("model down")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await run_idempotent("k", "fp", failing, store=store)
+        return await run_idempotent("k", "fp", _handler(calls), store=store)
+
+    response = asyncio.run(scenario())
+    assert calls == ["fail", "next question"]
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_expired_records_are_swept_on_claim(monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_TTL_SECONDS", 10)
+    clock = FakeClock()
+    store = InMemoryIdempotencyStore(sweep_interval=5, clock=clock)
+
+    async def scenario():
+        for i in range(100):
+            await run_idempotent(f"turn-{i}", "fp", _handler([]), store=store)
+        assert len(store._records) == 100
+        clock.now = 20
+        await run_idempotent("fresh", "fp", _handler([]), store=store)
+
+    asyncio.run(scenario())
+    assert len(store._records) == 1
+    assert store._events == {}
@@ -0,0 +1,35 @@
+import asyncio
+import copy
+
+from sqlmodel import create_engine
+
+from app import api, main
+from app.concurrency import concurrency_limiter, pool_capacity
+from app.loadtest import run
+
+
+def test_run_finishes_both_bursts(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/loadtest.db")
+    monkeypatch.setattr(api, "engine", engine)
+    monkeypatch.setattr(main, "engine", engine)
+    # run() points DATABASE_URL at its database and drives the process-wide limiter
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/loadtest.db")
+    monkeypatch.setenv("DEADLINE_CONTINUE_PROPOSAL_SECONDS", "60")
+    monkeypatch.setenv("DEADLINE_GENERATE_SECONDS", "60")
+    monkeypatch.setattr(concurrency_limiter, "enabled", concurrency_limiter.enabled)
+    monkeypatch.setattr(concurrency_limiter, "limits", copy.deepcopy(concurrency_limiter.limits))
+    monkeypatch.setattr(concurrency_limiter, "db_sessions", None)
+    monkeypatch.setattr(concurrency_limiter, "db_slots", None)
+    concurrency_limiter.limit_db_sessions(pool_capacity(engine))
+
+    bursts = asyncio.run(run(requests=40, latency=0.05, capacity=5, sessions=2,
+                             database_url=f"sqlite:///{tmp_path}/loadtest.db"))
+
+    assert set(bursts) == {False, True}
+    for results in bursts.values():
+        samples = [sample for kind_samples in results.values() for sample in kind_samples]
+        assert len(samples) == 40
+        # Everything either succeeds or is shed; nothing times out on the pool
+        assert {status for status, _ in samples} <= {200, 503}
+    limiter_off = [status for kind_samples in bursts[False].values() for status, _ in kind_samples]
+    assert 503 not in limiter_off
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models import ChatHistoryTable, ClientStats, DailySessionStats, ProposalSession, QuestionReachStats
+from app.rollups import (
+    dashboard_stats, ensure_rollup_columns, rebuild_rollups, record_chat_turn, record_proposal_generated,
+    record_question_reached, record_session_completed, record_session_started,
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def _snapshot(db):
+    return {
+        "daily": [row.model_dump() for row in db.exec(select(DailySessionStats)).all()],
+        "questions": {row.question_number: row.sessions_reached for row in db.exec(select(QuestionReachStats)).all()},
+        "clients": [row.model_dump() for row in db.exec(select(ClientStats)).all()],
+    }
+
+
+def _assistant(db, session_id, text):
+    entry = ChatHistoryTable(session_id=session_id, role="assistant", message=text)
+    db.add(entry)
+    return entry
+
+
+def _simulate(db, session_id, client_name, answers, completes, generates=False, turns_after_done=0):
+    """Write the same rows and rollup events the /start_proposal and /continue_proposal flow does."""
+    session = ProposalSession(session_id=session_id)
+    db.add(session)
+    record_session_started(db)
+    _assistant(db, session_id, "question 1")
+    db.commit()
+
+    asked = 1
+    for turn in range(answers + turns_after_done):
+        db.add(ChatHistoryTable(session_id=session_id, role="user", message=f"answer {turn}"))
+        record_chat_turn(db)
+        intake_done = completes and turn == answers - 1
+        reply = _assistant(db, session_id, "All done." if intake_done else f"question {asked + 1}")
+        if not intake_done and session.progress < 100:
+            asked += 1
+            record_question_reached(db, asked)
+        if intake_done:
+            session.client_name = client_name
+            session.progress = 100
+            session.completed_at = reply.timestamp
+            record_session_completed(db, answers, client_name, asked)
+        db.commit()
+
+    if generates:
+        session.latest_proposal = "# Proposal"
+        record_proposal_generated(db, client_name)
+        db.commit()
+    return session
+
+
+def test_increments_add_up(db):
+    record_session_started(db)
+    record_session_started(db)
+    record_chat_turn(db)
+    record_session_completed(db, 4, "Acme", 3)
+    record_proposal_generated(db, "Acme")
+    record_proposal_generated(db, "Acme")
+    db.commit()
+
+    (daily,) = db.exec(select(DailySessionStats)).all()
+    assert (daily.sessions_started, daily.sessions_completed, daily.turns_to_completion) == (2, 1, 4)
+    assert (daily.chat_turns, daily.proposals_generated) == (1, 2)
+    assert db.get(QuestionReachStats, 1).sessions_reached == 2
+    assert db.get(QuestionReachStats, 3).sessions_completed_after == 1
+    client = db.get(ClientStats, "Acme")
+    assert (client.sessions_completed, client.proposals_generated) == (1, 2)
+
+
+def test_rebuild_matches_live_counts(db):
+    _simulate(db, "done", "Acme", answers=3, completes=True, generates=True)
+    _simulate(db, "abandoned", "", answers=1, completes=False)
+    live = _snapshot(db)
+    assert live["questions"] == {1: 2, 2: 2, 3: 1}
+
+    rebuild_rollups(db)
+    assert _snapshot(db) == live
+
+
+def test_dashboard_reads_dropoff_and_clients(db):
+    _simulate(db, "done", "Acme", answers=3, completes=True, generates=True)
+    _simulate(db, "abandoned", "", answers=1, completes=False)
+
+    stats = dashboard_stats(db)
+    assert stats["average_turns_to_completion"] == 3
+    assert stats["sessions_per_day"][0]["sessions_started"] == 2
+    # The one session that reached question 3 finished the intake, it didn't drop off
+    assert [row["completed_after"] for row in stats["dropoff_by_question"]] == [0, 0, 1]
+    assert [row["dropped_after"] for row in stats["dropoff_by_question"]] == [0, 1, 0]
+    assert stats["proposals_per_client"] == [
+        {"client_name": "Acme", "sessions_completed": 1, "proposals_generated": 1}
+    ]
+
+
+def test_rebuild_dates_completion_when_it_happened(db):
+    session = _simulate(db, "done", "Acme", answers=3, completes=True, generates=True)
+    live = _snapshot(db)
+    # Later writes (a regenerated proposal, more chat) move updated_at but not the completion
+    session.updated_at = datetime.utcnow() + timedelta(days=3)
+    db.add(session)
+    db.commit()
+
+    rebuild_rollups(db)
+    assert _snapshot(db) == live
+
+
+def test_rebuild_ignores_chat_after_completion(db):
+    _simulate(db, "done", "Acme", answers=3, completes=True, turns_after_done=2)
+    live = _snapshot(db)
+    assert live["questions"] == {1: 1, 2: 1, 3: 1}
+
+    rebuild_rollups(db)
+    assert _snapshot(db) == live
+
+
+def test_rebuild_handles_sessions_completed_before_completed_at(db):
+    session = _simulate(db, "done", "Acme", answers=3, completes=True)
+    live = _snapshot(db)
+    session.completed_at = None
+    db.add(session)
+    db.commit()
+
+    rebuild_rollups(db)
+    assert _snapshot(db) == live
+
+
+def test_missing_rollup_columns_are_added():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE proposalsession (session_id VARCHAR PRIMARY KEY)"))
+        conn.execute(text("CREATE TABLE questionreachstats (question_number INTEGER PRIMARY KEY, "
+                          "sessions_reached INTEGER NOT NULL)"))
+        conn.execute(text("INSERT INTO questionreachstats VALUES (1, 5)"))
+    ensure_rollup_columns(engine)
+    ensure_rollup_columns(engine)  # idempotent
+
+    assert "completed_at" in {column["name"] for column in inspect(engine).get_columns("proposalsession")}
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT sessions_completed_after FROM questionreachstats")).scalar() == 0
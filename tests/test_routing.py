@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+
+from app.deadline import Deadline, DeadlineExceeded
+from app.routing import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ModelRouter, Route
+
+
+def _breaker(**kwargs):
+    return CircuitBreaker(max_p95_latency=1.0, max_error_rate=0.5, min_calls=4, cooldown=30, **kwargs)
+
+
+def test_breaker_trips_on_error_rate():
+    breaker = _breaker()
+    for ok in (True, False, False, False):
+        breaker.record(ok, 0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow_primary()
+
+
+def test_breaker_trips_on_p95_latency():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(True, 2.0)
+    assert breaker.state == OPEN
+
+
+def test_breaker_waits_for_min_calls():
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success():
+    breaker = _breaker(state=OPEN, opened_at=time.monotonic() - 60)
+    assert breaker.allow_primary()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_primary()  # Only one probe at a time
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = _breaker(state=OPEN, opened_at=time.monotonic() - 60)
+    assert breaker.allow_primary()
+    breaker.record(True, 5.0)  # Succeeded, but too slow
+    assert breaker.state == OPEN
+
+
+class FakeAgent:
+    """Hangs on the primary model and answers instantly on the fallback."""
+
+    def __init__(self, primary: str):
+        self.primary = primary
+        self.models = []
+
+    async def run(self, prompt, model, model_settings=None):
+        self.models.append(model.model_name)
+        if model.model_name == self.primary:
+            await asyncio.sleep(3600)
+        return FakeResult()
+
+
+class FakeResult:
+    output = "ok"
+
+    def usage(self):
+        return None
+
+
+def _router(max_p95_latency: float) -> ModelRouter:
+    router = ModelRouter({"chat": Route("primary-model", "fallback-model", None, max_p95_latency)})
+    router.breakers["chat"].min_calls = 3
+    return router
+
+
+def test_hung_primary_cancelled_by_deadline_trips_breaker():
+    router = _router(max_p95_latency=0.01)
+    agent = FakeAgent("primary-model")
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(DeadlineExceeded):
+                await Deadline(0.05).run(router.run("chat", agent, "hi"))
+        return await Deadline(0.05).run(router.run("chat", agent, "hi"))
+
+    result = asyncio.run(scenario())
+    assert result.output == "ok"
+    assert router.breakers["chat"].state == OPEN
+    assert agent.models[-1] == "fallback-model"
+
+
+def test_fast_cancellation_is_not_held_against_primary():
+    router = _router(max_p95_latency=10)
+    agent = FakeAgent("primary-model")
+
+    async def scenario():
+        for _ in range(5):
+            with pytest.raises(DeadlineExceeded):
+                await Deadline(0.01).run(router.run("chat", agent, "hi"))
+
+    asyncio.run(scenario())
+    assert router.breakers["chat"].state == CLOSED
+    assert list(router.breakers["chat"].outcomes) == []
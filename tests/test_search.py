@@ -0,0 +1,84 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import ChatHistoryTable, ProposalSession
+from app.search import _fts5_query, ensure_search_index, index_chat_message, index_session, search_documents
+
+
+def test_fts5_query_ands_bare_words():
+    assert _fts5_query("react postgres", None, None) == '"react" AND "postgres"'
+
+
+def test_fts5_query_keeps_quoted_phrase():
+    assert _fts5_query('"patient portal" react', None, None) == '"patient portal" AND "react"'
+
+
+def test_fts5_query_or_and_exclusion():
+    assert _fts5_query("react or vue -django", None, None) == '("react" OR "vue") NOT "django"'
+
+
+def test_fts5_query_neutralises_fts_syntax():
+    assert _fts5_query('NEAR(a b) * ^c', None, None) == '"NEAR a" AND "b" AND "c"'
+
+
+def test_fts5_query_multiple_exclusions():
+    assert _fts5_query("portal react -vue -django", None, None) == '("portal" AND "react") NOT "vue" NOT "django"'
+
+
+def test_fts5_query_only_exclusions_matches_nothing():
+    assert _fts5_query("-react", None, None) == ""
+
+
+def test_fts5_query_filters():
+    assert _fts5_query("portal", "Acme Health", "React, Postgres") == (
+        '"portal" AND client_name : "Acme Health" AND technologies : "React" AND technologies : "Postgres"'
+    )
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    ensure_search_index(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def _add_session(db, session_id, client_name, technologies, solution):
+    session = ProposalSession(session_id=session_id, client_name=client_name,
+                              technologies=technologies, proposed_solution=solution)
+    db.add(session)
+    db.flush()
+    index_session(db, session)
+    db.commit()
+    return session
+
+
+def test_phrase_search_respects_word_order(db):
+    _add_session(db, "a", "Acme Health", "React, Postgres", "A patient portal with booking")
+    _add_session(db, "b", "Globex", "Vue", "The portal is reached with a patient login")
+
+    assert {r["session_id"] for r in search_documents(db, "portal with")} == {"a", "b"}
+    assert [r["session_id"] for r in search_documents(db, '"portal with"')] == ["a"]
+
+
+def test_client_and_technology_filters(db):
+    _add_session(db, "a", "Acme Health", "React, Postgres", "Patient portal")
+    _add_session(db, "b", "Acme Logistics", "Postgres", "Patient portal")
+
+    assert [r["session_id"] for r in search_documents(db, "portal", client="Acme Health")] == ["a"]
+    assert [r["session_id"] for r in search_documents(db, "portal", technology="postgres react")] == ["a"]
+
+
+def test_chat_messages_pick_up_client_after_extraction(db):
+    session = _add_session(db, "a", "", "", "")
+    entry = ChatHistoryTable(message="We need scheduling for clinics", session_id="a", role="user")
+    db.add(entry)
+    db.flush()
+    index_chat_message(db, entry, session)
+    session.client_name = "Acme Health"
+    index_session(db, session)
+    db.commit()
+
+    results = search_documents(db, "scheduling", doc_type="chat", client="Acme Health")
+    assert [r["id"] for r in results] == [str(entry.id)]
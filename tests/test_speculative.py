@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from sqlmodel import Session, SQLModel
+
+from app import speculative
+from app.deadline import Deadline, DeadlineExceeded
+from app.routing import new_usage, usage_tracker
+from app.speculative import SpeculativeGenerations
+
+FIELDS = {"client_name": "Acme", "project_title": "Portal"}
+
+
+def _generate(text="proposal", delay=0.0, seen=None):
+    async def generate():
+        if seen is not None:
+            seen.append(usage_tracker.get())
+        await asyncio.sleep(delay)
+        return text
+    return generate
+
+
+def test_claim_returns_matching_speculation():
+    registry = SpeculativeGenerations()
+    stored = []
+
+    async def scenario():
+        registry.start("s1", FIELDS, _generate(delay=0.01), lambda fingerprint, text: stored.append(text))
+        return await registry.claim("s1", FIELDS, Deadline(5))
+
+    assert asyncio.run(scenario()) == "proposal"
+    assert stored == ["proposal"]
+    assert registry.hits == 1 and "s1" not in registry.entries
+
+
+def test_changed_fields_discard_speculation():
+    registry = SpeculativeGenerations()
+    stored = []
+
+    async def scenario():
+        registry.start("s1", FIELDS, _generate(delay=0.05), lambda fingerprint, text: stored.append(text))
+        task = registry.entries["s1"].task
+        result = await registry.claim("s1", {**FIELDS, "client_name": "Globex"}, Deadline(5))
+        await asyncio.sleep(0.1)
+        return result, task
+
+    result, task = asyncio.run(scenario())
+    assert result is None
+    assert task.cancelled()
+    assert stored == []
+
+
+def test_expired_background_budget_is_a_miss_not_a_timeout(monkeypatch):
+    monkeypatch.setitem(speculative.DEADLINE_BUDGETS, "generate", 0.01)
+    registry = SpeculativeGenerations()
+
+    async def scenario():
+        registry.start("s1", FIELDS, _generate(delay=1), lambda fingerprint, text: None)
+        return await registry.claim("s1", FIELDS, Deadline(5))
+
+    assert asyncio.run(scenario()) is None
+    assert registry.misses == 1
+
+
+def test_request_deadline_still_applies():
+    registry = SpeculativeGenerations()
+
+    async def scenario():
+        registry.start("s1", FIELDS, _generate(delay=1), lambda fingerprint, text: None)
+        await registry.claim("s1", FIELDS, Deadline(0.01))
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+
+
+def test_background_generation_does_not_bill_the_starting_request():
+    registry = SpeculativeGenerations()
+    seen = []
+
+    async def scenario():
+        token = usage_tracker.set(new_usage())
+        try:
+            registry.start("s1", FIELDS, _generate(seen=seen), lambda fingerprint, text: None)
+        finally:
+            usage_tracker.reset(token)
+        await registry.claim("s1", FIELDS, Deadline(5))
+
+    asyncio.run(scenario())
+    assert seen == [None]
+
+
+def test_disabled_registry_never_starts():
+    registry = SpeculativeGenerations(enabled=False)
+
+    async def scenario():
+        registry.start("s1", FIELDS, _generate(), lambda fingerprint, text: None)
+        return await registry.claim("s1", FIELDS, Deadline(5))
+
+    assert asyncio.run(scenario()) is None
+    assert registry.started == 0
+
+
+def test_speculative_store_never_overwrites_a_newer_proposal():
+    from app.api import _store_speculative_proposal, engine, proposal_base_data
+    from app.idempotency import fingerprint_request
+    from app.models import ProposalSession
+    from app.search import ensure_search_index
+
+    SQLModel.metadata.create_all(engine)
+    ensure_search_index(engine)
+    with Session(engine) as db:
+        session = ProposalSession(session_id="spec-store", client_name="Acme")
+        db.add(session)
+        db.commit()
+        fingerprint = fingerprint_request(proposal_base_data(session))
+        session.latest_proposal = "styled proposal"
+        db.add(session)
+        db.commit()
+
+    _store_speculative_proposal("spec-store", fingerprint, None, "default proposal")
+    with Session(engine) as db:
+        assert db.get(ProposalSession, "spec-store").latest_proposal == "styled proposal"
+
+    _store_speculative_proposal("spec-store", fingerprint, "styled proposal", "default proposal")
+    with Session(engine) as db:
+        assert db.get(ProposalSession, "spec-store").latest_proposal == "default proposal"